@@ -1,7 +1,14 @@
+import os
+import sys
 import cv2
 import numpy as np
 from datetime import datetime
 
+# The resource governor and the station config live in project/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "project"))
+from resource_governor import ResourceGovernor
+from station_config import StationConfig
+
 class BrakePadDefectDetector:
     def __init__(self):
         # Initialize webcam
@@ -248,6 +255,11 @@ def simple_brake_pad_detection():
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
+    # Keep this pipeline on the station's "vision" cores and threads so it does not slow OCR
+    governor = ResourceGovernor(StationConfig())
+    governor.apply("vision")
+    print(governor.describe())
+
     # Choose which version to run
     print("Choose detection method:")
     print("1. Full Detection System")
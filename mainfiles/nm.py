@@ -1,47 +1,156 @@
 import os
 os.environ['PYTHONIOENCODING'] = 'utf-8'
 
+import argparse
+import csv
+import sys
+import threading
 import cv2
-import easyocr
 import pandas as pd
 from datetime import datetime
 import time
 
+# The OCR backends, the shared OCR server client and the station config live in project/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "project"))
+from ocr_backends import BACKENDS, create_backend
+from ocr_cache import OCRCache
+from ocr_server import RemoteBackend, backend_for
+from station_config import StationConfig
+
 class OCRReader:
-    def __init__(self, languages=['en'], gpu=False):
-        # Disable verbose to avoid progress bar encoding issues
-        self.reader = easyocr.Reader(languages, gpu=gpu, verbose=False)
-    
+    """OCR on camera frames with one of the station's OCR backends (project/ocr_backends.py):
+    "easyocr", "tesseract", ..., or "server" for the shared OCR server (project/ocr_server.py)
+    so this app does not load a model of its own. Without an engine, the "ocr_server"
+    section of the station config decides between the server and easyocr."""
+    ENGINES = tuple(BACKENDS) + ("server",)
+
+    def __init__(self, languages=['en'], gpu=False, engine=None, config=None):
+        if engine is not None and engine not in self.ENGINES:
+            raise ValueError(f"Unknown OCR engine '{engine}', expected one of: {', '.join(self.ENGINES)}")
+        config = config or StationConfig()
+        if engine == "server":
+            config.data["ocr_server"] = dict(config.data.get("ocr_server") or {}, mode="client")
+        if engine in (None, "server"):
+            # Address and authkey come from the station config; a server that does not
+            # answer falls back to easyocr
+            self.backend = backend_for(config)
+        else:
+            self.backend = create_backend(engine, languages=tuple(languages), gpu=gpu)
+        self.engine = self.backend.name
+
     def read_text(self, frame):
-        # Convert frame from BGR (OpenCV) to RGB (EasyOCR expects RGB)
+        # Convert frame from BGR (OpenCV) to RGB (every backend expects RGB)
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.reader.readtext(rgb_frame)
-        if not results:
-            return ""
-        # Unpack only the second element (text) from each result
-        return " | ".join([result[1] for result in results])
+        return " | ".join(text for text, _ in self.backend.readtext(rgb_frame))
+
+    def close(self):
+        if isinstance(self.backend, RemoteBackend):
+            self.backend.client.close()
 
 class ExcelManager:
-    def __init__(self, filename):
+    """Logs captures to an append-only CSV journal and snapshots it to the xlsx file.
+
+    append_row only writes one line to the journal, so its cost does not grow with the
+    number of rows. The journal is fsynced every flush_rows rows or flush_interval seconds,
+    whichever comes first, and a background thread rewrites the workbook every
+    snapshot_interval seconds. After a crash the journal is replayed on the next start.
+    """
+    COLUMNS = ["no of product", "time", "info"]
+
+    def __init__(self, filename, flush_rows=20, flush_interval=10, snapshot_interval=60):
         self.filename = filename
+        self.journal_path = os.path.splitext(filename)[0] + ".journal.csv"
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.lock = threading.Lock()
+        self.rows = self.load_rows()
+        self.count = max((row[0] for row in self.rows), default=0) + 1
+
+        new_journal = not os.path.exists(self.journal_path)
+        self.journal = open(self.journal_path, "a", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.journal)
+        if new_journal:
+            # Seed the journal with whatever the workbook already holds so it is the full record
+            self.writer.writerow(self.COLUMNS)
+            self.writer.writerows(self.rows)
+            self.sync()
+        self.unsynced = 0
+        self.last_sync = time.time()
+        self.snapshot_rows = -1
+
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.background_loop, name="ExcelSnapshot", daemon=True)
+        self.thread.start()
+
+    def load_rows(self):
+        if os.path.exists(self.journal_path):
+            self.repair_journal()
+            with open(self.journal_path, newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                # A row cut short by a crash has the wrong number of fields; drop it
+                return [[int(row[0]), row[1], row[2]] for row in reader if len(row) == len(self.COLUMNS)]
         if os.path.exists(self.filename):
-            self.df = pd.read_excel(self.filename)
-            if not self.df.empty and "no of product" in self.df.columns:
-                self.count = int(self.df["no of product"].max()) + 1
-            else:
-                self.df = pd.DataFrame(columns=["no of product", "time", "info"])
-                self.df.to_excel(self.filename, index=False)
-                self.count = 1
-        else:
-            self.df = pd.DataFrame(columns=["no of product", "time", "info"])
-            self.df.to_excel(self.filename, index=False)
-            self.count = 1
-    
+            df = pd.read_excel(self.filename)
+            if not df.empty and "no of product" in df.columns:
+                df = df.reindex(columns=self.COLUMNS).fillna("")
+                return [[int(number), str(time_str), str(info)] for number, time_str, info in df.values.tolist()]
+        return []
+
+    def repair_journal(self):
+        # Trim a half-written last line so new rows do not get glued onto it
+        with open(self.journal_path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
     def append_row(self, time_str, info):
-        new_row = {"no of product": self.count, "time": time_str, "info": info}
-        self.df = pd.concat([self.df, pd.DataFrame([new_row])], ignore_index=True)
-        self.df.to_excel(self.filename, index=False)
-        self.count += 1
+        with self.lock:
+            row = [self.count, time_str, info]
+            self.writer.writerow(row)
+            self.rows.append(row)
+            self.count += 1
+            self.unsynced += 1
+            if self.unsynced >= self.flush_rows or time.time() - self.last_sync >= self.flush_interval:
+                self.sync()
+
+    def sync(self):
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.unsynced = 0
+        self.last_sync = time.time()
+
+    def background_loop(self):
+        last_snapshot = time.time()
+        while not self.stop_event.wait(min(self.flush_interval, self.snapshot_interval)):
+            with self.lock:
+                if self.unsynced:
+                    self.sync()
+            if time.time() - last_snapshot >= self.snapshot_interval:
+                self.write_snapshot()
+                last_snapshot = time.time()
+
+    def write_snapshot(self):
+        with self.lock:
+            rows = list(self.rows)
+        if len(rows) == self.snapshot_rows:
+            return
+        try:
+            tmp_path = self.filename + ".tmp.xlsx"
+            pd.DataFrame(rows, columns=self.COLUMNS).to_excel(tmp_path, index=False)
+            os.replace(tmp_path, self.filename)
+            self.snapshot_rows = len(rows)
+        except Exception as e:
+            print(f"Failed to write {self.filename}: {e}")
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+        with self.lock:
+            self.sync()
+            self.journal.close()
+        self.write_snapshot()
 
 class CameraManager:
     def __init__(self, camera_id=0):
@@ -103,7 +212,7 @@ class CameraManager:
             print("Camera released successfully")
 
 class ProductInfoApp:
-    def __init__(self, interval=5):
+    def __init__(self, interval=5, ocr_engine=None, config=None):
         self.interval = interval
         today_str = datetime.now().strftime("%d-%m-%Y")
         excel_file = f"product_info_{today_str}.xlsx"
@@ -112,8 +221,10 @@ class ProductInfoApp:
         
         try:
             self.camera = CameraManager()
-            self.ocr = OCRReader()
+            self.ocr = OCRReader(engine=ocr_engine, config=config)
             self.excel = ExcelManager(excel_file)
+            # Reuses the last OCR text while the camera keeps seeing the same picture
+            self.ocr_cache = OCRCache(max_age=60)
             self.last_capture_time = 0
             print("Application initialized successfully!")
         except RuntimeError as e:
@@ -123,7 +234,7 @@ class ProductInfoApp:
     def run(self):
         print(f"Saving to file: {self.excel.filename}")
         print("Application is running...")
-        print("- OCR captures every 5 seconds")
+        print(f"- OCR captures every {self.interval:g} seconds")
         print("- Press 'q' in camera window to quit (if window is available)")
         print("- Press Ctrl+C to quit from terminal")
         
@@ -142,8 +253,13 @@ class ProductInfoApp:
                 if current_time - self.last_capture_time >= self.interval:
                     self.last_capture_time = current_time
                     
-                    print("Processing frame for OCR...")
-                    text_detected = self.ocr.read_text(frame)
+                    frame_hash, text_detected = self.ocr_cache.lookup(0, frame)
+                    if text_detected is None:
+                        print("Processing frame for OCR...")
+                        text_detected = self.ocr.read_text(frame)
+                        self.ocr_cache.store(0, frame_hash, text_detected)
+                    else:
+                        print("Scene unchanged, reusing last OCR result")
                     now_time = datetime.now().strftime("%H:%M:%S")
                     self.excel.append_row(now_time, text_detected)
                     
@@ -153,7 +269,8 @@ class ProductInfoApp:
                         print(f"Test frame saved as camera_test_{frame_count}.jpg")
                         frame_count += 1
                     
-                    print(f"[{now_time}] Capture #{self.excel.count-1} saved -> {text_detected}")
+                    print(f"[{now_time}] Capture #{self.excel.count-1} saved -> {text_detected}"
+                          f" (OCR cache hit rate {self.ocr_cache.stats()['hit_rate']:.0%})")
                 
                 # Try to display the camera feed
                 if gui_available:
@@ -181,12 +298,21 @@ class ProductInfoApp:
         finally:
             print("Cleaning up...")
             self.camera.release()
+            self.ocr.close()
+            self.excel.close()
             cv2.destroyAllWindows()
             print("Application stopped successfully!")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log camera OCR text to a daily Excel file")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between captures")
+    parser.add_argument("--ocr-engine", choices=OCRReader.ENGINES,
+                        help="OCR engine (default: the shared server if the station config selects it, else easyocr)")
+    parser.add_argument("--config", default="station_config.json",
+                        help="station config with the \"ocr_server\" address and authkey")
+    args = parser.parse_args()
     try:
-        app = ProductInfoApp(interval=5)
+        app = ProductInfoApp(interval=args.interval, ocr_engine=args.ocr_engine, config=StationConfig(args.config))
         app.run()
     except Exception as e:
         print(f"Failed to start application: {e}")
@@ -3,6 +3,8 @@ import imutils
 from imutils import perspective
 import numpy as np
 import os
+from resource_governor import ResourceGovernor
+from station_config import StationConfig
 
 class BrakeMeasurement:
     KNOWN_WIDTH = 14 / 362  # Reference object width in cm
@@ -152,6 +154,8 @@ class BrakeMeasurement:
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
+    # Stay on the vision cores so measurement does not slow down OCR running alongside
+    ResourceGovernor(StationConfig()).apply("vision")
     reference_image_paths = [r"C:\github\COMPANY\images\front.png"]
     bm = BrakeMeasurement(reference_image_paths)
     bm.run()
@@ -0,0 +1,192 @@
+import csv
+import glob
+import gzip
+import os
+import threading
+from datetime import datetime, timedelta
+
+from database import to_datetime
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+PRODUCT_COLUMNS = ["id", "product_code", "timestamp", "camera_1_text", "camera_2_text", "camera_3_text",
+                   "validation_result", "image_path"]
+READING_COLUMNS = ["product_id", "camera_index", "text", "confidence", "latency_ms"]
+IMAGE_COLUMNS = ["product_id", "camera_number", "image_hash", "image_path", "timestamp"]
+
+
+# Inspection Archiver Class
+class InspectionArchiver:
+    """Moves inspections older than max_age_days out of SQLite into daily compressed partitions.
+
+    Each archived day becomes archive/<YYYY-MM-DD>/ with products, readings and images files,
+    written as Parquet when pyarrow is installed and gzip CSV otherwise. Production statistics
+    are left in the database, and image files stay in the image store.
+    """
+
+    def __init__(self, db_manager, archive_dir="archive", max_age_days=90, use_parquet=None):
+        self.db_manager = db_manager
+        self.archive_dir = archive_dir
+        self.max_age_days = max_age_days
+        self.use_parquet = (pyarrow is not None) if use_parquet is None else use_parquet
+        if self.use_parquet and pyarrow is None:
+            raise RuntimeError("Parquet archives need pyarrow; install it or pass use_parquet=False")
+        self.extension = ".parquet" if self.use_parquet else ".csv.gz"
+        self.stop_event = threading.Event()
+        self.thread = None
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    def start(self, interval_hours=24):
+        """Run archive_old_inspections now and then every interval_hours in a background thread."""
+        def loop():
+            while not self.stop_event.is_set():
+                try:
+                    self.archive_old_inspections()
+                except Exception as e:
+                    print(f"Archive error: {e}")
+                self.stop_event.wait(interval_hours * 3600)
+
+        self.thread = threading.Thread(target=loop, name="InspectionArchiver", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def archive_old_inspections(self, now=None):
+        """Archive every full day older than max_age_days; returns the number of inspections moved."""
+        cutoff = (now or datetime.now()) - timedelta(days=self.max_age_days)
+        cutoff_day = cutoff.strftime("%Y-%m-%d")
+        days = [row[0] for row in self.db_manager.reader().execute(
+            "SELECT DISTINCT date(timestamp) FROM inspections WHERE timestamp < ? ORDER BY 1", (cutoff_day,)
+        ).fetchall() if row[0]]
+
+        moved = 0
+        for day in days:
+            moved += self.archive_day(day)
+
+        if moved:
+            self.db_manager.incremental_vacuum().result()
+            print(f"Archived {moved} inspections from {len(days)} days to {self.archive_dir}")
+        return moved
+
+    def archive_day(self, day):
+        reader = self.db_manager.reader()
+        next_day = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        products = self.fetch(reader, f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM products "
+                                      "WHERE timestamp >= ? AND timestamp < ? ORDER BY id", (day, next_day))
+        if not products:
+            return 0
+
+        first_id, last_id = products[0]["id"], products[-1]["id"]
+        id_range = (first_id, last_id)
+        readings = self.fetch(reader, f"SELECT {', '.join(READING_COLUMNS)} FROM readings "
+                                      "WHERE product_id BETWEEN ? AND ? ORDER BY product_id, camera_index", id_range)
+        images = self.fetch(reader, f"SELECT {', '.join(IMAGE_COLUMNS)} FROM images "
+                                    "WHERE product_id BETWEEN ? AND ? ORDER BY product_id, camera_number", id_range)
+        # Inspections in the id range from other days (clock changes) stay in the database
+        product_ids = {row["id"] for row in products}
+        readings = [row for row in readings if row["product_id"] in product_ids]
+        images = [row for row in images if row["product_id"] in product_ids]
+
+        # Files are named by first id so a later run for the same day never overwrites a partition
+        partition = os.path.join(self.archive_dir, day)
+        os.makedirs(partition, exist_ok=True)
+        self.write_rows(os.path.join(partition, f"products-{first_id}{self.extension}"), PRODUCT_COLUMNS, products)
+        self.write_rows(os.path.join(partition, f"readings-{first_id}{self.extension}"), READING_COLUMNS, readings)
+        self.write_rows(os.path.join(partition, f"images-{first_id}{self.extension}"), IMAGE_COLUMNS, images)
+
+        # Only delete once the partition is safely on disk
+        self.db_manager.writer.submit(self._delete_inspections, sorted(product_ids)).result()
+        return len(products)
+
+    @staticmethod
+    def _delete_inspections(cursor, product_ids):
+        rows = [(product_id,) for product_id in product_ids]
+        cursor.executemany("DELETE FROM readings WHERE product_id = ?", rows)
+        cursor.executemany("DELETE FROM images WHERE product_id = ?", rows)
+        cursor.executemany("DELETE FROM inspections WHERE id = ?", rows)
+
+    @staticmethod
+    def fetch(reader, query, params):
+        cursor = reader.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def write_rows(self, path, columns, rows):
+        tmp_path = path + ".tmp"
+        if self.use_parquet:
+            table = pyarrow.table({column: [row[column] for row in rows] for column in columns})
+            pyarrow.parquet.write_table(table, tmp_path, compression="zstd")
+        else:
+            with gzip.open(tmp_path, "wt", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(rows)
+        os.replace(tmp_path, path)
+
+    def read_rows(self, path):
+        if path.endswith(".parquet"):
+            return pyarrow.parquet.read_table(path).to_pylist()
+        with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        # CSV loses types; restore the integer keys used for ordering and joins
+        for row in rows:
+            for key in ("id", "product_id", "camera_index", "camera_number"):
+                if row.get(key):
+                    row[key] = int(row[key])
+        return rows
+
+    def archived_days(self, start=None, end=None):
+        """Archived partition dates, newest first, limited to [start, end)."""
+        days = sorted((os.path.basename(path) for path in glob.glob(os.path.join(self.archive_dir, "????-??-??"))),
+                      reverse=True)
+        start_day = to_datetime(start).strftime("%Y-%m-%d") if start else None
+        end_day = to_datetime(end).strftime("%Y-%m-%d") if end else None
+        return [day for day in days
+                if (start_day is None or day >= start_day) and (end_day is None or day <= end_day)]
+
+    def query_history(self, start=None, end=None, validation_result=None, product_code=None, text=None):
+        """Yield products newest first from the live database and then from the archive.
+
+        Archived partitions outside [start, end) are not opened. text is a case-insensitive
+        substring match against the camera text columns.
+        """
+        # Timestamps are stored as "YYYY-MM-DD HH:MM:SS[.ffffff]", so bounds are compared in that form
+        start = to_datetime(start).isoformat(" ") if start is not None else None
+        end = to_datetime(end).isoformat(" ") if end is not None else None
+
+        def matches(row):
+            timestamp = str(row.get("timestamp") or "")
+            if start is not None and timestamp < start:
+                return False
+            if end is not None and timestamp >= end:
+                return False
+            if validation_result and row.get("validation_result") != validation_result:
+                return False
+            if product_code and row.get("product_code") != product_code:
+                return False
+            if text:
+                camera_text = " ".join(str(row.get(f"camera_{i}_text") or "") for i in range(1, 4))
+                if text.upper() not in camera_text.upper():
+                    return False
+            return True
+
+        filters = {"start": start, "end": end, "validation_result": validation_result, "product_code": product_code}
+        for row in self.db_manager.iter_products(**filters):
+            if matches(row):
+                yield row
+
+        # Everything archived is older than everything still live
+        for day in self.archived_days(start, end):
+            partition = os.path.join(self.archive_dir, day)
+            parts = sorted(glob.glob(os.path.join(partition, "products-*")),
+                           key=lambda path: int(os.path.basename(path).split("-")[1].split(".")[0]),
+                           reverse=True)
+            for path in parts:
+                for row in sorted(self.read_rows(path), key=lambda row: row["id"], reverse=True):
+                    if matches(row):
+                        yield row
@@ -0,0 +1,60 @@
+import cv2
+
+# How far (pixels) a label may move between frames and still be followed
+SEARCH_MARGIN = 16
+
+# Normalised correlation a box must keep with its template to count as found
+MATCH_THRESHOLD = 0.8
+
+# Re-run the detector after this many tracked frames even if the boxes still match
+MAX_TRACKED_FRAMES = 30
+
+
+def clip_box(box, shape):
+    """box ([x_min, x_max, y_min, y_max]) limited to an image of shape."""
+    height, width = shape[:2]
+    x_min, x_max, y_min, y_max = box
+    return [max(0, x_min), min(width, x_max), max(0, y_min), min(height, y_max)]
+
+
+def make_track(gray, boxes):
+    """Remember detector boxes ([x_min, x_max, y_min, y_max]) and the pixels inside them.
+
+    Detector boxes carry a margin and may reach past the frame edge, so templates are cut
+    from the box clipped to the frame ("regions"); the boxes themselves are kept as they
+    are for recognition and moved with their regions.
+    """
+    regions = [clip_box(box, gray.shape) for box in boxes]
+    templates = [gray[y_min:y_max, x_min:x_max].copy() for x_min, x_max, y_min, y_max in regions]
+    if not boxes or any(template.size == 0 for template in templates):
+        return None
+    return {"boxes": [list(box) for box in boxes], "regions": regions, "templates": templates, "age": 0}
+
+
+def follow(track, gray, margin=SEARCH_MARGIN, threshold=MATCH_THRESHOLD, max_age=MAX_TRACKED_FRAMES):
+    """Find every tracked box again in gray with template matching near its last position.
+
+    Returns the updated track, or None when any box is lost or the track is too old, in
+    which case the caller should run full detection.
+    """
+    if track is None or track["age"] >= max_age:
+        return None
+
+    height, width = gray.shape[:2]
+    boxes, regions = [], []
+    for box, (x_min, x_max, y_min, y_max), template in zip(track["boxes"], track["regions"], track["templates"]):
+        x0, y0 = max(0, x_min - margin), max(0, y_min - margin)
+        x1, y1 = min(width, x_max + margin), min(height, y_max + margin)
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+            return None
+        scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (dx, dy) = cv2.minMaxLoc(scores)
+        if best < threshold:
+            return None
+        shift_x, shift_y = x0 + dx - x_min, y0 + dy - y_min
+        regions.append([x_min + shift_x, x_max + shift_x, y_min + shift_y, y_max + shift_y])
+        boxes.append([box[0] + shift_x, box[1] + shift_x, box[2] + shift_y, box[3] + shift_y])
+
+    # Templates stay the ones from detection so small matching errors do not accumulate
+    return dict(track, boxes=boxes, regions=regions, age=track["age"] + 1)
@@ -0,0 +1,633 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+from image_store import ImageStore
+
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# Schema migrations, applied in order at startup. PRAGMA user_version records the
+# last one applied, so existing machine_vision.db files are upgraded in place.
+# Each step is a list of SQL statements or a callable taking a cursor.
+MIGRATIONS = [
+    (1, "create products and images tables", [
+        '''
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_code TEXT,
+                timestamp DATETIME,
+                camera_1_text TEXT,
+                camera_2_text TEXT,
+                camera_3_text TEXT,
+                validation_result TEXT,
+                image_path TEXT
+            )
+        ''',
+        '''
+            CREATE TABLE IF NOT EXISTS images (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_id INTEGER,
+                camera_number INTEGER,
+                image_data BLOB,
+                timestamp DATETIME,
+                FOREIGN KEY (product_id) REFERENCES products (id)
+            )
+        ''',
+    ]),
+    (2, "index lookup and ordering columns", [
+        "CREATE INDEX IF NOT EXISTS idx_products_product_code ON products (product_code, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_products_timestamp ON products (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_products_validation_result ON products (validation_result, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_images_product_id ON images (product_id)",
+    ]),
+    (3, "reference images in the on-disk image store", [
+        "ALTER TABLE images ADD COLUMN image_hash TEXT",
+        "ALTER TABLE images ADD COLUMN image_path TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_images_image_hash ON images (image_hash)",
+    ]),
+    (4, "key filtered indexes on id for keyset paging", [
+        # Single-column indexes carry the rowid, so "WHERE col = ? ORDER BY id DESC" needs no sort
+        "DROP INDEX IF EXISTS idx_products_product_code",
+        "DROP INDEX IF EXISTS idx_products_validation_result",
+        "CREATE INDEX IF NOT EXISTS idx_products_product_code_id ON products (product_code)",
+        "CREATE INDEX IF NOT EXISTS idx_products_validation_result_id ON products (validation_result)",
+    ]),
+    (5, "full-text index over camera OCR text", [
+        # External-content FTS5 table: the text lives only in products, triggers keep the index in sync
+        '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                camera_1_text, camera_2_text, camera_3_text,
+                content='products', content_rowid='id',
+                tokenize="unicode61 tokenchars '-_./'"
+            )
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts (rowid, camera_1_text, camera_2_text, camera_3_text)
+                VALUES (new.id, new.camera_1_text, new.camera_2_text, new.camera_3_text);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, camera_1_text, camera_2_text, camera_3_text)
+                VALUES ('delete', old.id, old.camera_1_text, old.camera_2_text, old.camera_3_text);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS products_fts_update
+            AFTER UPDATE OF camera_1_text, camera_2_text, camera_3_text ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, camera_1_text, camera_2_text, camera_3_text)
+                VALUES ('delete', old.id, old.camera_1_text, old.camera_2_text, old.camera_3_text);
+                INSERT INTO products_fts (rowid, camera_1_text, camera_2_text, camera_3_text)
+                VALUES (new.id, new.camera_1_text, new.camera_2_text, new.camera_3_text);
+            END
+        ''',
+        "INSERT INTO products_fts (products_fts) VALUES ('rebuild')",
+    ]),
+    (6, "hourly production statistics rollup", [
+        # Counts are only ever added, so archiving old products later keeps their history here
+        '''
+            CREATE TABLE IF NOT EXISTS product_stats_hourly (
+                hour TEXT NOT NULL,
+                product_code TEXT NOT NULL,
+                validation_result TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (hour, product_code, validation_result)
+            ) WITHOUT ROWID
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS product_stats_insert AFTER INSERT ON products BEGIN
+                INSERT INTO product_stats_hourly (hour, product_code, validation_result, count)
+                VALUES (COALESCE(strftime('%Y-%m-%d %H:00', new.timestamp), ''),
+                        COALESCE(new.product_code, ''), COALESCE(new.validation_result, ''), 1)
+                ON CONFLICT (hour, product_code, validation_result) DO UPDATE SET count = count + 1;
+            END
+        ''',
+        '''
+            INSERT INTO product_stats_hourly (hour, product_code, validation_result, count)
+            SELECT COALESCE(strftime('%Y-%m-%d %H:00', timestamp), ''),
+                   COALESCE(product_code, ''), COALESCE(validation_result, ''), COUNT(*)
+            FROM products GROUP BY 1, 2, 3
+        ''',
+    ]),
+    (7, "normalize camera text into a per-camera readings table", [
+        # The old FTS index and its triggers reference the camera columns being removed
+        "DROP TRIGGER IF EXISTS products_fts_insert",
+        "DROP TRIGGER IF EXISTS products_fts_delete",
+        "DROP TRIGGER IF EXISTS products_fts_update",
+        "DROP TABLE IF EXISTS products_fts",
+        # Renaming carries indexes, the stats trigger and the images foreign key along
+        "ALTER TABLE products RENAME TO inspections",
+        '''
+            CREATE TABLE IF NOT EXISTS readings (
+                id INTEGER PRIMARY KEY,
+                product_id INTEGER NOT NULL,
+                camera_index INTEGER NOT NULL,
+                text TEXT,
+                confidence REAL,
+                latency_ms REAL,
+                UNIQUE (product_id, camera_index),
+                FOREIGN KEY (product_id) REFERENCES inspections (id)
+            )
+        ''',
+        '''
+            INSERT INTO readings (product_id, camera_index, text)
+            SELECT id, 1, camera_1_text FROM inspections WHERE camera_1_text IS NOT NULL
+            UNION ALL SELECT id, 2, camera_2_text FROM inspections WHERE camera_2_text IS NOT NULL
+            UNION ALL SELECT id, 3, camera_3_text FROM inspections WHERE camera_3_text IS NOT NULL
+            ORDER BY 1, 2
+        ''',
+        "ALTER TABLE inspections DROP COLUMN camera_1_text",
+        "ALTER TABLE inspections DROP COLUMN camera_2_text",
+        "ALTER TABLE inspections DROP COLUMN camera_3_text",
+        # Compatibility view: existing queries keep reading products with camera_1..3 columns
+        '''
+            CREATE VIEW IF NOT EXISTS products AS
+            SELECT i.id, i.product_code, i.timestamp,
+                   (SELECT text FROM readings WHERE product_id = i.id AND camera_index = 1) AS camera_1_text,
+                   (SELECT text FROM readings WHERE product_id = i.id AND camera_index = 2) AS camera_2_text,
+                   (SELECT text FROM readings WHERE product_id = i.id AND camera_index = 3) AS camera_3_text,
+                   i.validation_result, i.image_path
+            FROM inspections i
+        ''',
+        '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS readings_fts USING fts5(
+                text, content='readings', content_rowid='id',
+                tokenize="unicode61 tokenchars '-_./'"
+            )
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS readings_fts_insert AFTER INSERT ON readings BEGIN
+                INSERT INTO readings_fts (rowid, text) VALUES (new.id, new.text);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS readings_fts_delete AFTER DELETE ON readings BEGIN
+                INSERT INTO readings_fts (readings_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS readings_fts_update AFTER UPDATE OF text ON readings BEGIN
+                INSERT INTO readings_fts (readings_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                INSERT INTO readings_fts (rowid, text) VALUES (new.id, new.text);
+            END
+        ''',
+        "INSERT INTO readings_fts (readings_fts) VALUES ('rebuild')",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Production shifts as (name, start hour, end hour); a shift may wrap past midnight
+SHIFTS = [("A", 6, 14), ("B", 14, 22), ("C", 22, 6)]
+
+
+def to_datetime(value):
+    """A datetime for a datetime, date string or ISO string ("2024-05-01T08:30" and the like)."""
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+# Database Writer Thread
+class DatabaseWriter(threading.Thread):
+    """Owns the only write connection and commits queued jobs in grouped transactions."""
+
+    def __init__(self, db_name, synchronous="NORMAL", batch_size=64, max_delay=0.05):
+        super().__init__(name="DatabaseWriter", daemon=True)
+        if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"synchronous must be one of {SYNCHRONOUS_LEVELS}, got {synchronous!r}")
+        self.db_name = db_name
+        self.synchronous = synchronous.upper()
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.jobs = queue.Queue()
+        self.ready = threading.Event()
+        self.batches_committed = 0
+        self.jobs_committed = 0
+
+    def submit(self, func, *args):
+        """Queue func(cursor, *args) for the writer; returns a Future with its result."""
+        if not self.is_alive() and self.ready.is_set():
+            raise RuntimeError("Database writer is stopped")
+        future = Future()
+        self.jobs.put((func, args, future))
+        return future
+
+    def flush(self, timeout=None):
+        """Block until every job queued so far has been committed."""
+        return self.submit(lambda cursor: None).result(timeout)
+
+    def stop(self, timeout=10):
+        self.jobs.put(None)
+        self.join(timeout)
+
+    def run(self):
+        conn = sqlite3.connect(self.db_name, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        self.ready.set()
+
+        stopping = False
+        while not stopping:
+            job = self.jobs.get()
+            if job is None:
+                break
+
+            # Group everything that arrives within max_delay into one transaction
+            batch = [job]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    job = self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+
+            self.commit_batch(conn, batch)
+
+        conn.close()
+        print("Database writer stopped")
+
+    def commit_batch(self, conn, batch):
+        cursor = conn.cursor()
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for func, args, future in batch:
+                # A savepoint per job keeps one bad insert from discarding the whole batch
+                cursor.execute("SAVEPOINT job")
+                try:
+                    results.append((future, func(cursor, *args), None))
+                    cursor.execute("RELEASE SAVEPOINT job")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT job")
+                    cursor.execute("RELEASE SAVEPOINT job")
+                    # Most callers never look at the Future, so make the failure visible here
+                    print(f"Database job {getattr(func, '__name__', func)} failed: {e}")
+                    results.append((future, None, e))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            print(f"Database batch commit error: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for func, args, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches_committed += 1
+        self.jobs_committed += len(batch)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+# Database Manager Class
+class DatabaseManager:
+    def __init__(self, db_name="machine_vision.db", synchronous="NORMAL", batch_size=64, max_delay=0.05,
+                 image_store=None):
+        self.db_name = db_name
+        if image_store is None:
+            image_store = ImageStore(os.path.join(os.path.dirname(os.path.abspath(db_name)), "image_store"))
+        self.image_store = image_store
+        self.readers = threading.local()
+        self.init_database()
+
+        self.writer = DatabaseWriter(db_name, synchronous, batch_size, max_delay)
+        self.writer.start()
+        self.writer.ready.wait(5)
+
+    def init_database(self):
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+
+        # WAL is persistent, so readers opened later see it even before the writer starts
+        conn.execute("PRAGMA journal_mode=WAL").fetchall()
+        self.migrate(conn)
+
+        # Incremental auto-vacuum lets archiving hand pages back without a full VACUUM.
+        # Switching an existing file over needs one VACUUM, which the blob move may already do.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.move_image_blobs(conn)
+        if conn.execute("PRAGMA auto_vacuum").fetchall()[0][0] != 2:
+            print("Enabling incremental vacuum, compacting database...")
+            conn.execute("VACUUM")
+        conn.close()
+
+    def migrate(self, conn):
+        """Apply every migration newer than the database's user_version, one transaction each."""
+        cursor = conn.cursor()
+        current = conn.execute("PRAGMA user_version").fetchall()[0][0]
+        if current > SCHEMA_VERSION:
+            raise RuntimeError(f"{self.db_name} has schema version {current}, "
+                               f"newer than this application supports ({SCHEMA_VERSION})")
+
+        for version, description, steps in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Migrating database to version {version}: {description}")
+            try:
+                cursor.execute("BEGIN")
+                if callable(steps):
+                    steps(cursor)
+                else:
+                    for statement in steps:
+                        cursor.execute(statement)
+                cursor.execute(f"PRAGMA user_version = {version}")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+        # Refresh planner statistics once the new indexes exist
+        if current < SCHEMA_VERSION:
+            cursor.execute("ANALYZE")
+
+    def move_image_blobs(self, conn, chunk_size=200):
+        """One-time move of JPEG BLOBs written by older versions into the image store."""
+        moved = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, image_data FROM images WHERE image_data IS NOT NULL LIMIT ?", (chunk_size,)
+            ).fetchall()
+            if not rows:
+                break
+            if moved == 0:
+                print("Moving stored images out of the database...")
+
+            updates = []
+            for image_id, image_data in rows:
+                image_hash, image_path = self.image_store.put(image_data)
+                updates.append((image_hash, image_path, image_id))
+
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE images SET image_hash = ?, image_path = ?, image_data = NULL WHERE id = ?", updates
+            )
+            conn.execute("COMMIT")
+            moved += len(updates)
+
+        if moved:
+            print(f"Moved {moved} images to {self.image_store.root}, compacting database...")
+            conn.execute("VACUUM")
+
+    def reader(self):
+        """Return this thread's read-only connection, opening it on first use."""
+        conn = getattr(self.readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_name}?mode=ro", uri=True)
+            self.readers.conn = conn
+        return conn
+
+    def insert_product(self, product_code, cam1_text, cam2_text, cam3_text, validation, image_path):
+        """Three-camera shorthand for insert_inspection."""
+        readings = [{"camera_index": i + 1, "text": text} for i, text in enumerate([cam1_text, cam2_text, cam3_text])]
+        return self.insert_inspection(product_code, readings, validation, image_path)
+
+    def insert_inspection(self, product_code, readings, validation, image_path="", images=()):
+        """Queue one inspection with its per-camera readings and images; returns a Future of its id.
+
+        readings is a list of dicts with camera_index (1-based), text and optionally
+        confidence and latency_ms, one per camera, however many cameras the station has.
+        images is a list of (camera_number, JPEG bytes) stored under the same id. The id is
+        assigned by SQLite when the writer commits, so several apps can share one database.
+        """
+        reading_rows = [
+            (reading["camera_index"], reading.get("text"), reading.get("confidence"), reading.get("latency_ms"))
+            for reading in readings
+        ]
+        return self.writer.submit(self._insert_inspection, product_code, datetime.now(), reading_rows,
+                                  validation, image_path, list(images))
+
+    def _insert_inspection(self, cursor, product_code, timestamp, reading_rows, validation, image_path, images):
+        cursor.execute('''
+            INSERT INTO inspections (product_code, timestamp, validation_result, image_path)
+            VALUES (?, ?, ?, ?)
+        ''', (product_code, timestamp, validation, image_path))
+        product_id = cursor.lastrowid
+        cursor.executemany('''
+            INSERT INTO readings (product_id, camera_index, text, confidence, latency_ms)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(product_id,) + row for row in reading_rows])
+        for camera_number, image_data in images:
+            self._insert_image(cursor, product_id, camera_number, image_data, timestamp)
+        return product_id
+
+    def get_readings(self, product_id):
+        """Return every camera reading of a product as dicts, ordered by camera."""
+        cursor = self.reader().execute(
+            "SELECT camera_index, text, confidence, latency_ms FROM readings WHERE product_id = ? ORDER BY camera_index",
+            (product_id,)
+        )
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def insert_image(self, product_id, camera_number, image_data):
+        """Add an image to an inspection that is already stored; returns a Future of its hash."""
+        return self.writer.submit(self._insert_image, product_id, camera_number, image_data, datetime.now())
+
+    def _insert_image(self, cursor, product_id, camera_number, image_data, timestamp):
+        # The JPEG goes to the image store (once per distinct frame); SQLite keeps only the reference
+        image_hash, image_path = self.image_store.put(image_data)
+        cursor.execute('''
+            INSERT INTO images (product_id, camera_number, image_hash, image_path, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (product_id, camera_number, image_hash, image_path, timestamp))
+        return image_hash
+
+    def get_image(self, image_id):
+        """Return the JPEG bytes for an images row, or None if it is unknown."""
+        row = self.reader().execute("SELECT image_hash FROM images WHERE id = ?", (image_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return self.image_store.get(row[0])
+
+    def get_product_images(self, product_id):
+        """Return (camera_number, image_hash, path) for every image of a product."""
+        rows = self.reader().execute(
+            "SELECT camera_number, image_hash FROM images WHERE product_id = ? ORDER BY camera_number",
+            (product_id,)
+        ).fetchall()
+        return [(camera_number, image_hash, self.image_store.path(image_hash)) for camera_number, image_hash in rows]
+
+    def incremental_vacuum(self, pages=0):
+        """Release free pages back to the filesystem (all of them when pages is 0)."""
+        return self.writer.submit(lambda cursor: cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall())
+
+    def flush(self, timeout=None):
+        self.writer.flush(timeout)
+
+    def search_product(self, product_code):
+        cursor = self.reader().cursor()
+        cursor.execute('SELECT * FROM products WHERE product_code = ? ORDER BY id DESC', (product_code,))
+        return cursor.fetchall()
+
+    def get_products_page(self, page_size=100, after_id=None, start=None, end=None, validation_result=None,
+                          product_code=None, ascending=False):
+        """Return (rows, next_after_id) for one page of products, newest first unless ascending.
+
+        Pages are keyed on id rather than OFFSET, so fetching page N costs the same as page 1.
+        Pass the returned next_after_id back in to get the following page; it is None on the
+        last page. start/end bound the timestamp (datetime or ISO string, end exclusive).
+        """
+        conditions = []
+        params = []
+        if after_id is not None:
+            conditions.append("id > ?" if ascending else "id < ?")
+            params.append(after_id)
+        # Timestamps are stored as "YYYY-MM-DD HH:MM:SS[.ffffff]", so bounds are compared in that form
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(to_datetime(start).isoformat(" "))
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(to_datetime(end).isoformat(" "))
+        if validation_result:
+            conditions.append("validation_result = ?")
+            params.append(validation_result)
+        if product_code:
+            conditions.append("product_code = ?")
+            params.append(product_code)
+
+        query = "SELECT * FROM products"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        # Fetch one extra row to learn whether another page exists
+        query += " ORDER BY id ASC LIMIT ?" if ascending else " ORDER BY id DESC LIMIT ?"
+        params.append(page_size + 1)
+
+        cursor = self.reader().execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        next_after_id = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_after_id = rows[-1]["id"]
+        return rows, next_after_id
+
+    @staticmethod
+    def fts_query(text):
+        """Turn free text into an FTS5 query matching every word; a trailing * keeps prefix search."""
+        terms = []
+        for word in text.split():
+            prefix = word.endswith("*")
+            word = word.rstrip("*").replace('"', '""')
+            if word:
+                terms.append(f'"{word}"' + ("*" if prefix else ""))
+        return " AND ".join(terms)
+
+    def search_text(self, query, limit=100, raw=False):
+        """Return products where some camera's OCR text matches query, newest first.
+
+        Plain words must all appear in one camera's reading (LOT-42 ABC*); pass raw=True
+        to use FTS5 syntax directly.
+        """
+        match = query if raw else self.fts_query(query)
+        if not match:
+            return []
+        cursor = self.reader().execute('''
+            SELECT * FROM products WHERE id IN (
+                SELECT DISTINCT product_id FROM readings WHERE id IN (
+                    SELECT rowid FROM readings_fts WHERE readings_fts MATCH ?
+                )
+                ORDER BY product_id DESC LIMIT ?
+            )
+            ORDER BY id DESC
+        ''', (match, limit))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def shift_expression(column="hour"):
+        hour = f"CAST(substr({column}, 12, 2) AS INTEGER)"
+        cases = []
+        for name, start, end in SHIFTS:
+            if start < end:
+                cases.append(f"WHEN {hour} >= {start} AND {hour} < {end} THEN '{name}'")
+            else:
+                cases.append(f"WHEN {hour} >= {start} OR {hour} < {end} THEN '{name}'")
+        return "CASE " + " ".join(cases) + " ELSE '' END"
+
+    def get_production_stats(self, group_by=("hour",), start=None, end=None, product_code=None):
+        """Pass/fail counts from the hourly rollup, grouped by any of hour, day, shift, product_code.
+
+        Reads product_stats_hourly (a few rows per hour) instead of scanning products.
+        start/end bound the hour (datetime or ISO string, end exclusive); every hour the
+        range touches is counted in full.
+        """
+        groups = {
+            "hour": "hour",
+            "day": "substr(hour, 1, 10)",
+            "shift": self.shift_expression(),
+            "product_code": "product_code",
+        }
+        unknown = [name for name in group_by if name not in groups]
+        if unknown:
+            raise ValueError(f"Unknown group_by {unknown}; expected any of {list(groups)}")
+
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append("hour >= ?")
+            params.append(to_datetime(start).strftime("%Y-%m-%d %H:00"))
+        if end is not None:
+            end = to_datetime(end)
+            if end != end.replace(minute=0, second=0, microsecond=0):
+                end += timedelta(hours=1)
+            conditions.append("hour < ?")
+            params.append(end.strftime("%Y-%m-%d %H:00"))
+        if product_code:
+            conditions.append("product_code = ?")
+            params.append(product_code)
+
+        select = [f"{groups[name]} AS {name}" for name in group_by]
+        query = "SELECT " + ", ".join(select + [
+            "SUM(count) AS total",
+            "SUM(CASE WHEN validation_result = 'PASS' THEN count ELSE 0 END) AS passed",
+            "SUM(CASE WHEN validation_result = 'FAIL' THEN count ELSE 0 END) AS failed",
+        ]) + " FROM product_stats_hourly"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if group_by:
+            positions = ", ".join(str(i + 1) for i in range(len(group_by)))
+            query += f" GROUP BY {positions} ORDER BY {positions}"
+
+        cursor = self.reader().execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        stats = []
+        for row in cursor.fetchall():
+            entry = dict(zip(columns, row))
+            entry["yield"] = round(entry["passed"] / entry["total"], 4) if entry["total"] else None
+            stats.append(entry)
+        return stats
+
+    def iter_products(self, page_size=500, **filters):
+        """Yield product rows one page at a time (newest first unless ascending=True)."""
+        after_id = None
+        while True:
+            rows, after_id = self.get_products_page(page_size, after_id, **filters)
+            yield from rows
+            if after_id is None:
+                break
+
+    def get_all_products(self):
+        """Whole table as a DataFrame; prefer get_products_page for anything user-facing."""
+        import pandas as pd
+        return pd.read_sql_query("SELECT * FROM products ORDER BY timestamp DESC", self.reader())
+
+    def close(self):
+        print("Closing database...")
+        self.writer.stop()
+        conn = getattr(self.readers, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.readers.conn = None
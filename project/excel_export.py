@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+EXCEL_COLUMNS = [
+    ("ID", "id"),
+    ("Product Code", "product_code"),
+    ("Timestamp", "timestamp"),
+    ("Camera 1 Text", "camera_1_text"),
+    ("Camera 2 Text", "camera_2_text"),
+    ("Camera 3 Text", "camera_3_text"),
+    ("Validation Result", "validation_result"),
+]
+
+
+# Excel Exporter Class
+class ExcelExporter:
+    """Builds product_info_*.xlsx reports from the database on demand.
+
+    Rows are streamed page by page into an openpyxl write-only workbook, so memory stays
+    bounded whatever the date range. Exports run one at a time on a background thread.
+    """
+
+    def __init__(self, db_manager, export_dir="."):
+        self.db_manager = db_manager
+        self.export_dir = export_dir
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ExcelExport")
+        os.makedirs(self.export_dir, exist_ok=True)
+
+    def default_filename(self, start, end):
+        start_day = str(start)[:10]
+        last_day = (datetime.strptime(str(end)[:10], "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+        if start_day == last_day:
+            name = datetime.strptime(start_day, "%Y-%m-%d").strftime("%d-%m-%Y")
+        else:
+            name = "{}_to_{}".format(*(datetime.strptime(day, "%Y-%m-%d").strftime("%d-%m-%Y")
+                                       for day in (start_day, last_day)))
+        return os.path.join(self.export_dir, f"product_info_{name}.xlsx")
+
+    @staticmethod
+    def day_range(day=None):
+        """Return (start, end) strings covering one calendar day (today by default)."""
+        day = day or datetime.now()
+        start = day.strftime("%Y-%m-%d") if isinstance(day, datetime) else str(day)[:10]
+        end = (datetime.strptime(start, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        return start, end
+
+    def export(self, start=None, end=None, filename=None, **filters):
+        """Write products with start <= timestamp < end to filename; returns (filename, row count)."""
+        from openpyxl import Workbook
+
+        if start is None and end is None:
+            start, end = self.day_range()
+        filename = filename or self.default_filename(start, end)
+        # Inspections still queued on the database writer (e.g. the last part before closing)
+        # belong in the report
+        self.db_manager.flush()
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Products")
+        sheet.append([header for header, _ in EXCEL_COLUMNS])
+
+        count = 0
+        for row in self.db_manager.iter_products(start=start, end=end, ascending=True, **filters):
+            sheet.append([row[key] for _, key in EXCEL_COLUMNS])
+            count += 1
+
+        tmp_path = filename + ".tmp.xlsx"
+        workbook.save(tmp_path)
+        os.replace(tmp_path, filename)
+        print(f"Exported {count} products to {filename}")
+        return filename, count
+
+    def export_async(self, start=None, end=None, filename=None, **filters):
+        """Queue an export on the background thread; returns a Future of (filename, row count)."""
+        return self.executor.submit(self.export, start, end, filename, **filters)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+# Reason codes, worst first when several apply
+NO_FRAME = "NO_FRAME"
+DARK = "DARK"
+OVEREXPOSED = "OVEREXPOSED"
+EMPTY = "EMPTY"
+BLUR = "BLUR"
+OK = "OK"
+
+DEFAULT_THRESHOLDS = {
+    "min_sharpness": 60.0,     # variance of the Laplacian; motion blur drives it towards 0
+    "dark_mean": 40,           # mean grey level below this is too dark to read
+    "bright_mean": 225,        # mean grey level above this is washed out
+    "max_clipped": 0.3,        # fraction of pixels at 250+ that counts as overexposed
+    "min_contrast": 12.0,      # grey-level standard deviation of a scene with anything in it
+    "min_edge_fraction": 0.01, # fraction of Canny edge pixels; labels with text have plenty
+}
+
+
+def text_for(reason):
+    """What an inspection shows for a camera whose frames were rejected."""
+    return f"Poor image ({reason.lower().replace('_', ' ')})"
+
+
+# Frame Quality Class
+class FrameQuality:
+    """Cheap checks run before OCR so blurred, badly exposed or empty frames are not read.
+
+    assess() returns a dict with "reason" (OK or one of the codes above), "sharpness",
+    "brightness", "contrast" and "ok"; thresholds come from the "quality" section of the
+    station config when one is given.
+    """
+
+    def __init__(self, config=None):
+        self.config = config
+
+    def thresholds(self):
+        settings = (self.config.data.get("quality") or {}) if self.config else {}
+        return dict(DEFAULT_THRESHOLDS, **{key: value for key, value in settings.items() if key in DEFAULT_THRESHOLDS})
+
+    def assess(self, frame):
+        if frame is None or frame.size == 0:
+            return {"reason": NO_FRAME, "ok": False, "sharpness": 0.0, "brightness": 0.0, "contrast": 0.0}
+
+        limits = self.thresholds()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel() / gray.size
+        levels = np.arange(256)
+        brightness = float((histogram * levels).sum())
+        contrast = float(np.sqrt((histogram * (levels - brightness) ** 2).sum()))
+        clipped = float(histogram[250:].sum())
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+        # A blurred label still has contrast but loses its edges, so a lack of edges only means
+        # an empty scene once the frame is known to be sharp
+        if brightness < limits["dark_mean"]:
+            reason = DARK
+        elif brightness > limits["bright_mean"] or clipped > limits["max_clipped"]:
+            reason = OVEREXPOSED
+        elif contrast < limits["min_contrast"]:
+            reason = EMPTY
+        elif sharpness < limits["min_sharpness"]:
+            reason = BLUR
+        elif np.count_nonzero(cv2.Canny(gray, 50, 150)) / gray.size < limits["min_edge_fraction"]:
+            reason = EMPTY
+        else:
+            reason = OK
+        return {"reason": reason, "ok": reason == OK, "sharpness": sharpness, "brightness": brightness,
+                "contrast": contrast}
+
+    def best(self, frames, crop=None):
+        """(frame, quality) for the sharpest acceptable frame, or the sharpest one if none pass.
+
+        crop(frame) narrows each frame to the part OCR will read before it is judged.
+        """
+        best_frame, best_quality = None, None
+        for frame in frames:
+            quality = self.assess(crop(frame) if crop else frame)
+            if best_quality is None or (quality["ok"], quality["sharpness"]) > (best_quality["ok"],
+                                                                                 best_quality["sharpness"]):
+                best_frame, best_quality = frame, quality
+        return best_frame, best_quality
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import tempfile
+
+
+# Image Store Class
+class ImageStore:
+    """Content-addressed JPEG store: each image is written once under <root>/ab/cd/<sha256>.jpg."""
+
+    def __init__(self, root="image_store", extension=".jpg"):
+        self.root = root
+        self.extension = extension
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def hash_bytes(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def relative_path(self, image_hash):
+        return os.path.join(image_hash[:2], image_hash[2:4], image_hash + self.extension)
+
+    def path(self, image_hash):
+        return os.path.join(self.root, self.relative_path(image_hash))
+
+    def put(self, data):
+        """Store data if it is not already present; returns (hash, path relative to root)."""
+        image_hash = self.hash_bytes(data)
+        relative_path = self.relative_path(image_hash)
+        full_path = os.path.join(self.root, relative_path)
+
+        if not os.path.exists(full_path):
+            directory = os.path.dirname(full_path)
+            os.makedirs(directory, exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial JPEG
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, full_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        return image_hash, relative_path
+
+    def get(self, image_hash):
+        full_path = self.path(image_hash)
+        if not os.path.exists(full_path):
+            return None
+        with open(full_path, "rb") as f:
+            return f.read()
+
+    def exists(self, image_hash):
+        return os.path.exists(self.path(image_hash))
@@ -1,138 +1,189 @@
 import sys
 import os
+import time
+STARTUP_BEGIN = time.perf_counter()  # taken before the heavy imports below for the startup breakdown
 import cv2
 import threading
-import sqlite3
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-import pandas as pd
-import easyocr
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, send_file
 import base64
 import warnings
+from database import DatabaseManager
+from excel_export import ExcelExporter
+from archive import InspectionArchiver
+from frame_quality import BLUR, EMPTY, FrameQuality, text_for
+from ocr_server import create_ocr_service
+from ocr_service import crop_roi
+from product_format import ProductFormats
+from resource_governor import ResourceGovernor
+from station_config import StationConfig
+from validation import ValidationEngine
 warnings.filterwarnings("ignore", category=UserWarning, module="torch")
 
-# Database Manager Class
-class DatabaseManager:
-    def __init__(self, db_name="machine_vision.db"):
-        self.db_name = db_name
-        self.init_database()
-
-    def init_database(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        # Create products table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_code TEXT,
-                timestamp DATETIME,
-                camera_1_text TEXT,
-                camera_2_text TEXT,
-                camera_3_text TEXT,
-                validation_result TEXT,
-                image_path TEXT
-            )
-        ''')
-
-        # Create images table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS images (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER,
-                camera_number INTEGER,
-                image_data BLOB,
-                timestamp DATETIME,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
-
-    def insert_product(self, product_code, cam1_text, cam2_text, cam3_text, validation, image_path):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+# Number of inspection cameras on this station
+CAMERA_COUNT = 3
 
-        cursor.execute('''
-            INSERT INTO products (product_code, timestamp, camera_1_text, camera_2_text, 
-                                camera_3_text, validation_result, image_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (product_code, datetime.now(), cam1_text, cam2_text, cam3_text, validation, image_path))
+# Recognize all cameras in one batched OCR call instead of one worker per camera
+# (run ocr_benchmark.py --pool to see which is faster on this machine)
+OCR_BATCHED = False
 
-        product_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return product_id
+# OCR engine from ocr_backends.BACKENDS ("easyocr", "tesseract" or "stub" for dry runs);
+# compare them on local images with: python ocr_benchmark.py --dataset <folder>
+OCR_BACKEND = "easyocr"
 
-    def insert_image(self, product_id, camera_number, image_data):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+# Reuse each camera's detected text boxes while template matching still finds them, so
+# only the recognizer runs until the label moves (see box_tracker.py)
+TRACK_LABEL_BOXES = True
 
-        cursor.execute('''
-            INSERT INTO images (product_id, camera_number, image_data, timestamp)
-            VALUES (?, ?, ?, ?)
-        ''', (product_id, camera_number, image_data, datetime.now()))
+# Recent frames kept per camera; an inspection reads the sharpest, well-exposed one
+FRAME_BURST = 5
 
-        conn.commit()
-        conn.close()
+# When a camera's frames are all blurred, wait this long for a sharper one before giving up
+QUALITY_RETRY_MS = 200
+QUALITY_RETRIES = 2
 
-    def search_product(self, product_code):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+# Built-in validation rule: PASS when any camera read some text. Rules per product code
+# can be declared under "validation" in station_config.json (see validation.py).
+DEFAULT_VALIDATION_RULE = {"mode": "any", "cameras": {"*": {"any": []}}}
 
-        cursor.execute('SELECT * FROM products WHERE product_code = ?', (product_code,))
-        result = cursor.fetchall()
-        conn.close()
-        return result
-
-    def get_all_products(self):
-        conn = sqlite3.connect(self.db_name)
-        df = pd.read_sql_query("SELECT * FROM products ORDER BY timestamp DESC", conn)
-        conn.close()
-        return df
+# Inspections older than this many days move from the database to the archive folder
+ARCHIVE_AFTER_DAYS = 90
 
 # OCR Manager Class - FIXED
 class OCRManager:
-    def __init__(self):
+    """Crops frames to the configured camera ROIs and formats results from the OCR worker pool.
+
+    Recognition itself runs in OCRService, or in the shared OCR server (see ocr_server.py).
+    """
+
+    def __init__(self, config=None, workers=CAMERA_COUNT, batched=OCR_BATCHED, backend=OCR_BACKEND,
+                 track_boxes=TRACK_LABEL_BOXES, governor=None):
         os.environ['PYTHONIOENCODING'] = 'utf-8'
+        self.config = config
+        self.quality = FrameQuality(config)
+        self.formats = ProductFormats(config)
+        # Box tracking reads cameras one per worker, so it does not combine with batching
+        self.track_boxes = track_boxes and not batched
+        # The shared OCR server when the station config selects it; otherwise workers load the
+        # model in the background once start() is called
+        self.service = create_ocr_service(config, workers=workers, batched=batched, backend=backend,
+                                          governor=governor)
+
+    def start(self, on_ready, on_error):
+        """Load and warm up the model in every worker; on_ready({pid: startup ms}) or
+        on_error(exception) runs on a pool thread."""
+        print(f"Starting {OCR_BACKEND} OCR workers...")
+        self.service.when_ready(on_ready, on_error)
+
+    def crop(self, camera_id, frame):
+        return crop_roi(frame, self.config.roi(camera_id) if self.config else None)
+
+    def select_frame(self, camera_id, frames):
+        """(frame, quality) for the best of a camera's recent frames, judged on its OCR region."""
+        return self.quality.best(frames, crop=lambda frame: self.crop(camera_id, frame))
+
+    def read_frames(self, frames, product_code=None):
+        """Returns a Future of {camera_index: result}; pass each result to format_text.
+
+        Recognition is limited to the characters, length and pattern configured for
+        product_code under "formats" in station_config.json (see product_format.py).
+        """
+        cropped = {i: self.crop(i, frame) for i, frame in frames.items()}
+        product_format = self.formats.format_for(product_code)
+        if self.track_boxes:
+            return self.service.read_frames_tracked(cropped, product_format)
+        return self.service.read_frames(cropped, product_format=product_format)
+
+    def reset_tracking(self):
+        self.service.reset_tracks()
+
+    def tracking_summary(self):
+        stats = self.service.track_stats
+        total = stats["tracked"] + stats["detected"]
+        if not self.track_boxes or not total:
+            return None
+        return f"Text detection skipped on {stats['tracked']} of {total} reads ({stats['tracked'] / total:.0%})"
+
+    def read_text(self, frame, camera_id=None, product_code=None):
+        if frame is None:
+            return "No OCR available"
+        if len(frame.shape) != 3:
+            return "Invalid frame"
+        if camera_id is not None:
+            frame = self.crop(camera_id, frame)
+        quality = self.quality.assess(frame)
+        if not quality["ok"]:
+            return text_for(quality["reason"])
         try:
-            print("Initializing EasyOCR...")
-            self.reader = easyocr.Reader(['en'], gpu=False, verbose=False)
-            print("EasyOCR initialized successfully")
+            return self.format_text(self.service.submit(frame, self.formats.format_for(product_code)).result())
         except Exception as e:
-            print(f"EasyOCR initialization error: {e}")
-            self.reader = None
-
-    def read_text(self, frame):
-        if frame is None or self.reader is None:
-            return "No OCR available"
+            return self.format_text(e)
 
-        try:
-            # Ensure frame is valid
-            if len(frame.shape) != 3:
-                return "Invalid frame"
+    @staticmethod
+    def format_text(result):
+        if isinstance(result, Exception):
+            print(f"OCR Error: {result}")
+            return f"OCR Error: {str(result)}"
 
-            # Convert to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results, latency_ms = result
+        if not results:
+            return "No text detected"
 
-            # Perform OCR
-            print(f"Processing OCR on frame of size: {frame.shape}")
-            results = self.reader.readtext(rgb_frame, detail=0)  # detail=0 returns only text
+        detected_text = " | ".join(text for text, _ in results)
+        print(f"OCR detected in {latency_ms:.0f} ms: {detected_text}")
+        return detected_text
 
-            if not results:
-                return "No text detected"
+    def close(self):
+        self.service.close()
 
-            detected_text = " | ".join(results)
-            print(f"OCR detected: {detected_text}")
-            return detected_text
+# Camera label that lets the user drag out an OCR region while editing is on
+class RoiLabel(QLabel):
+    roi_drawn = pyqtSignal(int, object)  # camera_id, QRect in label coordinates
 
-        except Exception as e:
-            print(f"OCR Error: {e}")
-            return f"OCR Error: {str(e)}"
+    def __init__(self, camera_id, text=""):
+        super().__init__(text)
+        self.camera_id = camera_id
+        self.editing = False
+        self.drag_start = None
+        self.drag_rect = None
+
+    def set_editing(self, editing):
+        self.editing = editing
+        self.setCursor(Qt.CrossCursor if editing else Qt.ArrowCursor)
+
+    def mousePressEvent(self, event):
+        if self.editing and event.button() == Qt.LeftButton:
+            self.drag_start = event.pos()
+            self.drag_rect = QRect(self.drag_start, self.drag_start)
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self.drag_start is not None:
+            self.drag_rect = QRect(self.drag_start, event.pos()).normalized()
+            self.update()
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self.drag_start is not None:
+            rect = QRect(self.drag_start, event.pos()).normalized()
+            self.drag_start = None
+            self.drag_rect = None
+            self.update()
+            if rect.width() > 5 and rect.height() > 5:
+                self.roi_drawn.emit(self.camera_id, rect)
+        super().mouseReleaseEvent(event)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.drag_rect is not None:
+            painter = QPainter(self)
+            painter.setPen(QPen(QColor(255, 193, 7), 2, Qt.DashLine))
+            painter.drawRect(self.drag_rect)
+            painter.end()
 
 # Camera Manager Class - FIXED
 class CameraManager(QThread):
@@ -225,58 +276,11 @@ class CameraManager(QThread):
         self.quit()
         self.wait(3000)  # Wait up to 3 seconds
 
-# Excel Manager Class - FIXED
-class ExcelManager:
-    def __init__(self):
-        self.create_excel_file()
-
-    def create_excel_file(self):
-        today_str = datetime.now().strftime("%d-%m-%Y")
-        self.filename = f"product_info_{today_str}.xlsx"
-
-        if not os.path.exists(self.filename):
-            df = pd.DataFrame(columns=[
-                "ID", "Product Code", "Timestamp", "Camera 1 Text", 
-                "Camera 2 Text", "Camera 3 Text", "Validation Result"
-            ])
-            df.to_excel(self.filename, index=False)
-            print(f"Created Excel file: {self.filename}")
-
-    def append_data(self, product_id, product_code, cam1_text, cam2_text, cam3_text, validation):
-        try:
-            # Read existing data
-            if os.path.exists(self.filename):
-                df = pd.read_excel(self.filename)
-            else:
-                df = pd.DataFrame(columns=[
-                    "ID", "Product Code", "Timestamp", "Camera 1 Text", 
-                    "Camera 2 Text", "Camera 3 Text", "Validation Result"
-                ])
-
-            new_row = {
-                "ID": product_id,
-                "Product Code": product_code,
-                "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "Camera 1 Text": cam1_text,
-                "Camera 2 Text": cam2_text,
-                "Camera 3 Text": cam3_text,
-                "Validation Result": validation
-            }
-
-            # Add new row
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-
-            # Save to Excel
-            df.to_excel(self.filename, index=False)
-            print(f"Data saved to Excel: {self.filename}")
-
-        except Exception as e:
-            print(f"Excel write error: {e}")
-
 # Web Server Manager Class - FIXED
 class WebServerManager:
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, excel_exporter=None):
         self.db_manager = db_manager
+        self.excel_exporter = excel_exporter or ExcelExporter(db_manager)
         self.app = Flask(__name__)
         self.setup_routes()
 
@@ -290,20 +294,73 @@ class WebServerManager:
                 <h1>Machine Vision System - Web Interface</h1>
                 <p>API Endpoints:</p>
                 <ul>
-                    <li><a href="/api/products" style="color: lightblue;">/api/products</a> - Get all products</li>
+                    <li><a href="/api/products" style="color: lightblue;">/api/products</a> - Latest products (?limit=&amp;after_id=&amp;start=&amp;end=&amp;result=)</li>
                     <li>/api/search/&lt;product_code&gt; - Search specific product</li>
+                    <li><a href="/api/export" style="color: lightblue;">/api/export</a> - Download Excel report (?start=YYYY-MM-DD&amp;end=YYYY-MM-DD, default today)</li>
+                    <li>/api/search_text?q=&lt;text&gt; - Search camera OCR text</li>
+                    <li><a href="/api/stats?group_by=day,shift" style="color: lightblue;">/api/stats</a> - Pass/fail counts (group_by=hour,day,shift,product_code)</li>
+                    <li><a href="/view" style="color: lightblue;">/view</a> - Product history browser</li>
                 </ul>
             </body>
             </html>
             '''
 
+        @self.app.route('/view')
+        def view():
+            return render_template('index.html')
+
         @self.app.route('/api/products')
         def get_products():
             try:
-                df = self.db_manager.get_all_products()
-                return jsonify(df.to_dict('records'))
+                rows, next_after_id = self.db_manager.get_products_page(
+                    page_size=min(request.args.get('limit', 100, type=int), 1000),
+                    after_id=request.args.get('after_id', type=int),
+                    start=request.args.get('start'),
+                    end=request.args.get('end'),
+                    validation_result=request.args.get('result'),
+                    product_code=request.args.get('product_code'),
+                )
+                return jsonify({"success": True, "products": rows, "next_after_id": next_after_id})
             except Exception as e:
-                return jsonify({"error": str(e)})
+                return jsonify({"success": False, "error": str(e)})
+
+        @self.app.route('/api/search_text')
+        def search_text():
+            try:
+                query = request.args.get('q', '')
+                limit = min(request.args.get('limit', 100, type=int), 1000)
+                return jsonify({"success": True, "products": self.db_manager.search_text(query, limit)})
+            except Exception as e:
+                return jsonify({"success": False, "error": str(e)})
+
+        @self.app.route('/api/stats')
+        def production_stats():
+            try:
+                group_by = [name for name in request.args.get('group_by', 'hour').split(',') if name]
+                stats = self.db_manager.get_production_stats(
+                    group_by=group_by,
+                    start=request.args.get('start'),
+                    end=request.args.get('end'),
+                    product_code=request.args.get('product_code'),
+                )
+                return jsonify({"success": True, "stats": stats})
+            except Exception as e:
+                return jsonify({"success": False, "error": str(e)})
+
+        @self.app.route('/api/export')
+        def export_excel():
+            try:
+                start = request.args.get('start')
+                end = request.args.get('end')
+                if not start:
+                    start, end = ExcelExporter.day_range()
+                elif not end:
+                    end = ExcelExporter.day_range(start)[1]
+                # Shares the GUI's export thread so reports are built one at a time
+                filename, _ = self.excel_exporter.export_async(start, end).result()
+                return send_file(os.path.abspath(filename), as_attachment=True)
+            except Exception as e:
+                return jsonify({"success": False, "error": str(e)})
 
         @self.app.route('/api/search/<product_code>')
         def search_product(product_code):
@@ -325,38 +382,107 @@ class WebServerManager:
 
 # Main GUI Application Class - FIXED
 class MachineVisionApp(QMainWindow):
+    export_finished = pyqtSignal(str)  # status message from the export thread
+    ocr_finished = pyqtSignal(object)  # (handler, future, args) from the OCR pool
+    ocr_ready = pyqtSignal(object)  # {worker pid: startup ms} once the OCR model is warm
+    ocr_failed = pyqtSignal(str)  # why the OCR workers could not start
+
     def __init__(self):
         super().__init__()
         self.is_fullscreen = False
+        init_begin = time.perf_counter()
+        self.startup_ms = {"imports": (init_begin - STARTUP_BEGIN) * 1000}
 
         # Initialize managers
         print("Initializing application...")
         self.db_manager = DatabaseManager()
-        self.ocr_manager = OCRManager()
-        self.excel_manager = ExcelManager()
-        self.web_server = WebServerManager(self.db_manager)
+        self.startup_ms["database"] = (time.perf_counter() - init_begin) * 1000
+        self.station_config = StationConfig()
+        # Keep this process (GUI, camera threads) off the cores the OCR workers are given
+        self.governor = ResourceGovernor(self.station_config)
+        self.governor.apply("capture")
+        print(self.governor.describe())
+        self.ocr_manager = OCRManager(self.station_config, governor=self.governor)
+        self.validator = ValidationEngine(DEFAULT_VALIDATION_RULE, self.station_config)
+        self.excel_exporter = ExcelExporter(self.db_manager)
+        # First day whose product_info_<day>.xlsx Reset and close still have to write
+        self.export_day = datetime.now().date()
+        self.web_server = WebServerManager(self.db_manager, self.excel_exporter)
+        self.archiver = InspectionArchiver(self.db_manager, max_age_days=ARCHIVE_AFTER_DAYS)
 
         # Camera managers
+        self.camera_count = CAMERA_COUNT
         self.cameras = {}
         self.camera_frames = {}
+        self.frame_bursts = {}  # camera_id -> the last FRAME_BURST frames
         self.camera_labels = {}
 
         # OCR processing
         self.processing_timer = QTimer()
         self.processing_timer.timeout.connect(self.process_ocr)
         self.ocr_interval = 5000  # 5 seconds
+        self.ocr_pending = False
+        self.ocr_loaded = False
+        self.queued_inspections = []  # (product_code, frames, rejected) requested while the model loads
+        self.quality_retries = 0
 
+        self.export_finished.connect(self.show_export_result)
+        self.ocr_finished.connect(self.deliver_ocr)
+        self.ocr_ready.connect(self.on_ocr_ready)
+        self.ocr_failed.connect(self.on_ocr_failed)
+
+        ui_begin = time.perf_counter()
         self.init_ui()
         self.setup_menu()
         self.setup_statusbar()
         self.apply_dark_styles()
+        self.startup_ms["ui"] = (time.perf_counter() - ui_begin) * 1000
 
-        # Start web server
+        # Start web server and the daily archive job
         self.web_server.start_server()
-        self.statusBar().showMessage("System initialized - Web server at http://localhost:5000")
-
-        # Setup cameras after UI is ready
-        QTimer.singleShot(1000, self.setup_cameras)  # Delay camera setup
+        self.archiver.start()
+        self.statusBar().showMessage("OCR model loading... - Web server at http://localhost:5000")
+
+        # The model loads in the worker processes while the window and cameras come up
+        self.ocr_manager.start(self.ocr_ready.emit, lambda e: self.ocr_failed.emit(str(e)))
+
+        # Setup cameras as soon as the event loop runs
+        QTimer.singleShot(0, self.setup_cameras)
+        QTimer.singleShot(0, self.record_window_shown)
+
+    def record_window_shown(self):
+        self.startup_ms["window_shown"] = (time.perf_counter() - STARTUP_BEGIN) * 1000
+
+    def on_ocr_failed(self, message):
+        # Inspections stay queued; without OCR workers the application has to be restarted
+        print(f"OCR workers failed to start: {message}")
+        self.result_box.append(f"OCR failed to start: {message} - restart the application")
+        self.statusBar().showMessage("OCR FAILED TO START - Web server at http://localhost:5000")
+
+    def on_ocr_ready(self, worker_ms):
+        self.ocr_loaded = True
+        self.startup_ms["ocr_ready"] = (time.perf_counter() - STARTUP_BEGIN) * 1000
+
+        # Workers load in parallel, so the slowest one is what the user waited for
+        slowest = max(worker_ms.values(), key=lambda ms: sum(ms.values()), default={})
+        breakdown = (f"Startup: imports {self.startup_ms['imports']:.0f} ms, database {self.startup_ms['database']:.0f} ms, "
+                     f"UI {self.startup_ms['ui']:.0f} ms, window shown at {self.startup_ms.get('window_shown', 0):.0f} ms, "
+                     f"OCR ready at {self.startup_ms['ocr_ready']:.0f} ms")
+        if slowest:
+            breakdown += (f" (OCR library import {slowest['import']:.0f} ms, model load {slowest['model']:.0f} ms, "
+                          f"warm-up {slowest['warm_up']:.0f} ms)")
+        print(breakdown)
+        self.result_box.append(breakdown)
+        self.statusBar().showMessage("System initialized - OCR ready - Web server at http://localhost:5000")
+
+        if self.queued_inspections:
+            self.result_box.append(f"Running {len(self.queued_inspections)} queued inspection(s)")
+        self.run_queued_inspection()
+
+    def run_queued_inspection(self):
+        if self.queued_inspections and not self.ocr_pending:
+            product_code, frames, rejected = self.queued_inspections.pop(0)
+            self.run_ocr(frames, self.finish_inspection, product_code, frames, rejected)
 
     def init_ui(self):
         self.setWindowTitle("Machine Vision System - Professional")
@@ -377,7 +503,7 @@ class MachineVisionApp(QMainWindow):
         camera_grid.setSpacing(10)
 
         # Create camera display frames
-        for i in range(3):
+        for i in range(self.camera_count):
             frame = QFrame()
             frame.setStyleSheet("background-color: #3a3a3a; border: 2px solid #555; border-radius: 5px;")
             frame.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -393,17 +519,20 @@ class MachineVisionApp(QMainWindow):
             layout.addWidget(title)
 
             # Camera feed label
-            camera_label = QLabel("Connecting...")
+            camera_label = RoiLabel(i, "Connecting...")
             camera_label.setAlignment(Qt.AlignCenter)
             camera_label.setStyleSheet("color: #888; background: transparent; border: none;")
             camera_label.setMinimumSize(280, 200)
             camera_label.setScaledContents(True)
+            camera_label.roi_drawn.connect(self.save_roi)
             layout.addWidget(camera_label)
 
             self.camera_labels[i] = camera_label
 
             # Position cameras in grid
-            if i < 2:
+            if self.camera_count != 3:
+                camera_grid.addWidget(frame, i // 2, i % 2)
+            elif i < 2:
                 camera_grid.addWidget(frame, i, 0)
             else:
                 camera_grid.addWidget(frame, 0, 1, 2, 1)
@@ -558,7 +687,7 @@ class MachineVisionApp(QMainWindow):
 
     def setup_cameras(self):
         print("Setting up cameras...")
-        for i in range(3):
+        for i in range(self.camera_count):
             camera = CameraManager(i)
             camera.frame_ready.connect(self.update_camera_display)
             camera.status_update.connect(self.update_camera_status)
@@ -574,8 +703,16 @@ class MachineVisionApp(QMainWindow):
             if frame is None:
                 return
 
+            # Outline the OCR region on the preview only; OCR gets the untouched frame
+            display = frame
+            roi = self.station_config.roi(camera_id)
+            if roi:
+                display = frame.copy()
+                cv2.rectangle(display, (int(roi["x"]), int(roi["y"])),
+                              (int(roi["x"] + roi["w"]), int(roi["y"] + roi["h"])), (7, 193, 255), 2)
+
             # Convert frame to QPixmap
-            rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            rgb_image = cv2.cvtColor(display, cv2.COLOR_BGR2RGB)
             h, w, ch = rgb_image.shape
             bytes_per_line = ch * w
             qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
@@ -592,56 +729,140 @@ class MachineVisionApp(QMainWindow):
 
             # Store frame for OCR processing
             self.camera_frames[camera_id] = frame.copy()
+            self.frame_bursts.setdefault(camera_id, deque(maxlen=FRAME_BURST)).append(self.camera_frames[camera_id])
 
         except Exception as e:
             print(f"Display update error for camera {camera_id}: {e}")
 
+    def toggle_roi_editing(self, editing):
+        for label in self.camera_labels.values():
+            label.set_editing(editing)
+        if editing:
+            self.statusBar().showMessage("Drag a box on a camera view to set its OCR region")
+        else:
+            self.statusBar().showMessage("OCR region editing finished")
+
+    def save_roi(self, camera_id, rect):
+        frame = self.camera_frames.get(camera_id)
+        label = self.camera_labels[camera_id]
+        if frame is None or label.width() == 0 or label.height() == 0:
+            self.result_box.append(f"Camera {camera_id+1}: no feed, OCR region not changed")
+            return
+
+        # The preview is stretched to fill the label, so scale each axis separately
+        frame_h, frame_w = frame.shape[:2]
+        sx, sy = frame_w / label.width(), frame_h / label.height()
+        roi = {"x": int(rect.x() * sx), "y": int(rect.y() * sy),
+               "w": int(rect.width() * sx), "h": int(rect.height() * sy)}
+        self.station_config.set_roi(camera_id, roi)
+        self.ocr_manager.reset_tracking()
+        self.result_box.append(f"Camera {camera_id+1}: OCR region set to {roi['w']}x{roi['h']} at ({roi['x']}, {roi['y']})")
+
+    def clear_rois(self):
+        for camera_id in range(self.camera_count):
+            self.station_config.set_roi(camera_id, None)
+        self.ocr_manager.reset_tracking()
+        self.result_box.append("OCR regions cleared - full frames will be read")
+
+    def run_ocr(self, frames, handler, product_code, *args):
+        """Recognize {camera_index: frame} in the OCR pool for product_code, then call
+        handler(ocr_results, product_code, *args) here."""
+        self.ocr_pending = True
+        future = self.ocr_manager.read_frames(frames, product_code)
+        # The callback runs on a pool thread; the signal hands the result to the GUI thread
+        future.add_done_callback(lambda f: self.ocr_finished.emit((handler, f, (product_code,) + args)))
+
+    def deliver_ocr(self, payload):
+        handler, future, args = payload
+        self.ocr_pending = False
+        try:
+            ocr_results = {i: self.ocr_manager.format_text(result) for i, result in future.result().items()}
+            handler(ocr_results, *args)
+        except Exception as e:
+            print(f"OCR processing error: {e}")
+            self.result_box.append(f"OCR Processing Error: {str(e)}")
+        self.run_queued_inspection()
+
     def process_ocr(self):
         try:
             product_code = self.entry_box.text().strip()
             if not product_code:
                 self.result_box.append("Please enter a product code first!")
                 return
+            # Snapshot the frames so the saved images match the recognized text
+            frames, rejected = self.select_frames()
+            if BLUR in rejected.values() and self.quality_retries < QUALITY_RETRIES:
+                # Give a moving part or refocusing camera a moment to deliver a sharp frame
+                self.quality_retries += 1
+                QTimer.singleShot(QUALITY_RETRY_MS, self.process_ocr)
+                return
+            self.quality_retries = 0
+            if not frames and rejected and all(reason == EMPTY for reason in rejected.values()):
+                self.statusBar().showMessage("No part in view - inspection skipped")
+                return
 
-            print(f"Processing OCR for product code: {product_code}")
-
-            # Process OCR for all cameras
-            ocr_results = {}
-            for i in range(3):
-                if i in self.camera_frames:
-                    print(f"Processing camera {i+1}")
-                    text = self.ocr_manager.read_text(self.camera_frames[i])
-                    ocr_results[i] = text
-                    print(f"Camera {i+1} result: {text}")
-                else:
-                    ocr_results[i] = "No feed"
-                    print(f"Camera {i+1}: No feed available")
-
-            # Determine validation result
-            validation_result = self.validate_product(ocr_results)
-            print(f"Validation result: {validation_result}")
-
-            # Update indicators
-            self.update_status_indicators(validation_result)
-
-            # Display results
-            self.display_results(product_code, ocr_results, validation_result)
+            if not self.ocr_loaded:
+                self.queued_inspections.append((product_code, frames, rejected))
+                self.result_box.append(f"OCR model still loading - inspection of {product_code} queued "
+                                       f"({len(self.queued_inspections)} waiting)")
+                return
+            if self.ocr_pending:
+                print("Previous inspection still running, skipping")
+                return
 
-            # Save to database and Excel
-            self.save_results(product_code, ocr_results, validation_result)
+            print(f"Processing OCR for product code: {product_code}")
+            self.run_ocr(frames, self.finish_inspection, product_code, frames, rejected)
 
         except Exception as e:
             print(f"OCR processing error: {e}")
             self.result_box.append(f"OCR Processing Error: {str(e)}")
 
-    def validate_product(self, ocr_results):
-        # Simple validation logic - customize as needed
-        valid_cameras = 0
-        for text in ocr_results.values():
-            if text and text != "No feed" and text != "No text detected" and "Error" not in text:
-                valid_cameras += 1
-
-        return "PASS" if valid_cameras >= 1 else "FAIL"  # Changed to >= 1 for easier testing
+    def select_frames(self):
+        """({camera_index: best frame}, {camera_index: reason}) over each camera's recent frames.
+
+        Cameras whose frames are all blurred, badly exposed or empty are left out of OCR and
+        reported with the quality reason code instead.
+        """
+        frames, rejected = {}, {}
+        for i in range(self.camera_count):
+            burst = list(self.frame_bursts.get(i, ()))
+            if not burst:
+                continue
+            frame, quality = self.ocr_manager.select_frame(i, burst)
+            if quality["ok"]:
+                frames[i] = frame
+            else:
+                rejected[i] = quality["reason"]
+                print(f"Camera {i+1}: no usable frame ({quality['reason']}, sharpness {quality['sharpness']:.0f}, "
+                      f"brightness {quality['brightness']:.0f})")
+        return frames, rejected
+
+    def finish_inspection(self, ocr_results, product_code, frames, rejected=None):
+        for i, reason in (rejected or {}).items():
+            ocr_results[i] = text_for(reason)
+        for i in range(self.camera_count):
+            if i not in ocr_results:
+                ocr_results[i] = "No feed"
+                print(f"Camera {i+1}: No feed available")
+        ocr_results = dict(sorted(ocr_results.items()))
+
+        # Determine validation result
+        validation_result = self.validate_product(product_code, ocr_results)
+        print(f"Validation result: {validation_result}")
+
+        # Update indicators
+        self.update_status_indicators(validation_result)
+
+        # Display results
+        self.display_results(product_code, ocr_results, validation_result)
+
+        # Save to database
+        self.save_results(product_code, ocr_results, validation_result, frames)
+
+    def validate_product(self, product_code, ocr_results):
+        validation_result, camera_passed = self.validator.validate(product_code, ocr_results)
+        print(f"Cameras passed: {camera_passed}")
+        return validation_result
 
     def update_status_indicators(self, validation_result):
         if validation_result == "PASS":
@@ -668,37 +889,34 @@ class MachineVisionApp(QMainWindow):
         cursor.movePosition(QTextCursor.End)
         self.result_box.setTextCursor(cursor)
 
-    def save_results(self, product_code, ocr_results, validation_result):
+    def save_results(self, product_code, ocr_results, validation_result, frames=None):
+        frames = self.camera_frames if frames is None else frames
         try:
             print("Saving results...")
 
             # Save to database
-            product_id = self.db_manager.insert_product(
-                product_code,
-                ocr_results.get(0, ""),
-                ocr_results.get(1, ""),
-                ocr_results.get(2, ""),
-                validation_result,
-                ""  # image_path - can be implemented later
-            )
-
-            # Save images to database
-            for i, frame in self.camera_frames.items():
+            readings = [
+                {"camera_index": i + 1, "text": ocr_results.get(i, "")}
+                for i in range(self.camera_count)
+            ]
+
+            # Images go to the image store with the inspection, under the id SQLite assigns it
+            images = []
+            for i, frame in frames.items():
                 if frame is not None:
                     _, buffer = cv2.imencode('.jpg', frame)
-                    image_data = buffer.tobytes()
-                    self.db_manager.insert_image(product_id, i+1, image_data)
-
-            # Save to Excel
-            self.excel_manager.append_data(
-                product_id, product_code,
-                ocr_results.get(0, ""),
-                ocr_results.get(1, ""),
-                ocr_results.get(2, ""),
-                validation_result
-            )
+                    images.append((i + 1, buffer.tobytes()))
 
-            print(f"Results saved with ID: {product_id}")
+            future = self.db_manager.insert_inspection(
+                product_code,
+                readings,
+                validation_result,
+                "",  # image_path - can be implemented later
+                images
+            )
+            # Failures are logged by the database writer
+            future.add_done_callback(
+                lambda f: f.exception() is None and print(f"Results saved with ID: {f.result()}"))
 
         except Exception as e:
             print(f"Save error: {e}")
@@ -729,6 +947,9 @@ class MachineVisionApp(QMainWindow):
         self.processing_timer.stop()
         self.statusBar().showMessage("Auto processing stopped")
         self.result_box.append("Auto processing stopped")
+        summary = self.ocr_manager.tracking_summary()
+        if summary:
+            self.result_box.append(summary)
 
     def reset_system(self):
         self.entry_box.clear()
@@ -737,7 +958,8 @@ class MachineVisionApp(QMainWindow):
         # Reset indicators
         self.fail_indicator.setStyleSheet("background-color: #495057; border: 2px solid #343a40; border-radius: 5px;")
         self.pass_indicator.setStyleSheet("background-color: #495057; border: 2px solid #343a40; border-radius: 5px;")
-        self.statusBar().showMessage("System reset")
+        self.export_daily_workbooks(self.report_export)
+        self.statusBar().showMessage("System reset - exporting today's Excel file")
         self.result_box.append("System reset - Ready for new processing")
 
     def capture_images(self):
@@ -763,8 +985,7 @@ class MachineVisionApp(QMainWindow):
 
     def open_database_view(self):
         try:
-            df = self.db_manager.get_all_products()
-            dialog = DatabaseViewDialog(df, self)
+            dialog = DatabaseViewDialog(self.db_manager, self)
             dialog.exec_()
         except Exception as e:
             QMessageBox.warning(self, "Database Error", f"Could not open database: {e}")
@@ -778,6 +999,11 @@ class MachineVisionApp(QMainWindow):
 
         # File Menu
         file_menu = menubar.addMenu('File')
+        export_action = QAction('Export Excel...', self)
+        export_action.setShortcut('Ctrl+E')
+        export_action.triggered.connect(self.export_excel)
+        file_menu.addAction(export_action)
+
         exit_action = QAction('Exit', self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
@@ -789,6 +1015,51 @@ class MachineVisionApp(QMainWindow):
         fullscreen_action.triggered.connect(self.toggle_fullscreen)
         view_menu.addAction(fullscreen_action)
 
+        # Settings Menu
+        settings_menu = menubar.addMenu('Settings')
+        roi_action = QAction('Edit OCR Regions', self)
+        roi_action.setCheckable(True)
+        roi_action.toggled.connect(self.toggle_roi_editing)
+        settings_menu.addAction(roi_action)
+
+        clear_roi_action = QAction('Clear OCR Regions', self)
+        clear_roi_action.triggered.connect(self.clear_rois)
+        settings_menu.addAction(clear_roi_action)
+
+    def export_excel(self):
+        dialog = ExportDialog(self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+
+        start, end = dialog.date_range()
+        self.statusBar().showMessage(f"Exporting {start} to {end} to Excel...")
+        future = self.excel_exporter.export_async(start, end)
+        future.add_done_callback(self.report_export)
+
+    def export_daily_workbooks(self, on_done=None):
+        """Write product_info_<day>.xlsx for each day since the last export, today included."""
+        today = datetime.now().date()
+        day = self.export_day
+        while day <= today:
+            future = self.excel_exporter.export_async(*ExcelExporter.day_range(day))
+            if on_done:
+                future.add_done_callback(on_done)
+            day += timedelta(days=1)
+        # Today's file is rewritten on the next export, since more parts may come in
+        self.export_day = today
+
+    def report_export(self, future):
+        # Runs on the export thread; the signal hands the message to the GUI thread
+        try:
+            filename, count = future.result()
+            self.export_finished.emit(f"Exported {count} products to {filename}")
+        except Exception as e:
+            self.export_finished.emit(f"Excel export error: {e}")
+
+    def show_export_result(self, message):
+        self.statusBar().showMessage(message)
+        self.result_box.append(message)
+
     def setup_statusbar(self):
         self.statusBar().showMessage('Initializing - Please wait...')
 
@@ -828,16 +1099,55 @@ class MachineVisionApp(QMainWindow):
         for camera in self.cameras.values():
             camera.stop()
 
+        # Write the daily workbook (the exporter waits for queued inserts), then stop the
+        # database writer
+        self.archiver.stop()
+        self.ocr_manager.close()
+        self.export_daily_workbooks(lambda future: future.exception() and print(f"Excel export error: {future.exception()}"))
+        self.excel_exporter.close()
+        self.db_manager.close()
+
         print("Application closed")
         event.accept()
 
+# Export Dialog
+class ExportDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export Excel Report")
+
+        layout = QFormLayout(self)
+        today = QDate.currentDate()
+        self.from_date = QDateEdit(today)
+        self.to_date = QDateEdit(today)
+        for date_edit in [self.from_date, self.to_date]:
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("dd-MM-yyyy")
+        layout.addRow("From:", self.from_date)
+        layout.addRow("To:", self.to_date)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def date_range(self):
+        """Return (start, end) as ISO dates with end exclusive, covering both selected days."""
+        start = self.from_date.date().toString("yyyy-MM-dd")
+        end = self.to_date.date().addDays(1).toString("yyyy-MM-dd")
+        return start, end
+
 # Database View Dialog
 class DatabaseViewDialog(QDialog):
-    def __init__(self, df, parent=None):
+    PAGE_SIZE = 200
+
+    def __init__(self, db_manager, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Database View")
         self.setGeometry(200, 200, 1000, 600)
-        self.db_manager = parent.db_manager if parent else None
+        self.db_manager = db_manager
+        self.next_after_id = None
+        self.columns = []
 
         layout = QVBoxLayout(self)
 
@@ -845,65 +1155,116 @@ class DatabaseViewDialog(QDialog):
         search_layout = QHBoxLayout()
         search_label = QLabel("Search Product Code:")
         self.search_entry = QLineEdit()
+        self.result_filter = QComboBox()
+        self.result_filter.addItems(["All", "PASS", "FAIL"])
         search_btn = QPushButton("Search")
         refresh_btn = QPushButton("Refresh")
 
         search_btn.clicked.connect(self.search_product)
         refresh_btn.clicked.connect(self.refresh_data)
+        self.result_filter.currentIndexChanged.connect(self.search_product)
 
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.search_entry)
+        search_layout.addWidget(self.result_filter)
         search_layout.addWidget(search_btn)
         search_layout.addWidget(refresh_btn)
         layout.addLayout(search_layout)
 
+        # OCR text search
+        text_layout = QHBoxLayout()
+        text_label = QLabel("Search OCR Text:")
+        self.text_entry = QLineEdit()
+        self.text_entry.setPlaceholderText("e.g. LOT-1234 or INN*")
+        text_btn = QPushButton("Find Text")
+
+        text_btn.clicked.connect(self.search_text)
+        self.text_entry.returnPressed.connect(self.search_text)
+
+        text_layout.addWidget(text_label)
+        text_layout.addWidget(self.text_entry)
+        text_layout.addWidget(text_btn)
+        layout.addLayout(text_layout)
+
         # Table view
         self.table = QTableWidget()
-        self.populate_table(df)
         layout.addWidget(self.table)
 
-        # Close button
+        # Paging and close buttons
+        button_layout = QHBoxLayout()
+        self.more_btn = QPushButton("Load More")
+        self.more_btn.clicked.connect(self.load_more)
         close_btn = QPushButton("Close")
         close_btn.clicked.connect(self.accept)
-        layout.addWidget(close_btn)
-
-    def populate_table(self, df):
-        if df.empty:
+        button_layout.addWidget(self.more_btn)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.refresh_data()
+
+    def current_filters(self):
+        result = self.result_filter.currentText()
+        return {
+            "product_code": self.search_entry.text().strip() or None,
+            "validation_result": None if result == "All" else result,
+        }
+
+    def load_page(self, append=False):
+        after_id = self.next_after_id if append else None
+        rows, self.next_after_id = self.db_manager.get_products_page(
+            self.PAGE_SIZE, after_id, **self.current_filters()
+        )
+        self.populate_table(rows, append)
+        self.more_btn.setEnabled(self.next_after_id is not None)
+
+    def populate_table(self, rows, append=False):
+        if not rows and not append:
             self.table.setRowCount(1)
             self.table.setColumnCount(1)
             self.table.setItem(0, 0, QTableWidgetItem("No data available"))
             return
 
-        self.table.setRowCount(len(df))
-        self.table.setColumnCount(len(df.columns))
-        self.table.setHorizontalHeaderLabels(df.columns.tolist())
+        if not append:
+            self.columns = list(rows[0].keys())
+            self.table.setRowCount(0)
+            self.table.setColumnCount(len(self.columns))
+            self.table.setHorizontalHeaderLabels(self.columns)
 
-        for i, row in df.iterrows():
-            for j, value in enumerate(row):
-                self.table.setItem(i, j, QTableWidgetItem(str(value)))
+        start_row = self.table.rowCount()
+        self.table.setRowCount(start_row + len(rows))
+        for i, row in enumerate(rows):
+            for j, column in enumerate(self.columns):
+                self.table.setItem(start_row + i, j, QTableWidgetItem(str(row[column])))
 
     def search_product(self):
-        if not self.db_manager:
+        self.load_page()
+
+    def search_text(self):
+        query = self.text_entry.text().strip()
+        if not query:
+            self.load_page()
+            return
+        try:
+            rows = self.db_manager.search_text(query, self.PAGE_SIZE)
+        except Exception as e:
+            QMessageBox.warning(self, "Search Error", f"Invalid text search: {e}")
             return
+        self.next_after_id = None
+        self.more_btn.setEnabled(False)
+        if rows:
+            self.populate_table(rows)
+        else:
+            self.table.setRowCount(1)
+            self.table.setColumnCount(1)
+            self.table.setItem(0, 0, QTableWidgetItem("No results found"))
 
-        product_code = self.search_entry.text().strip()
-        if product_code:
-            results = self.db_manager.search_product(product_code)
-            # Convert results to DataFrame for display
-            if results:
-                columns = ["ID", "Product Code", "Timestamp", "Camera 1", "Camera 2", "Camera 3", "Validation", "Image Path"]
-                df = pd.DataFrame(results, columns=columns)
-                self.populate_table(df)
-            else:
-                # Show no results
-                self.table.setRowCount(1)
-                self.table.setColumnCount(1)
-                self.table.setItem(0, 0, QTableWidgetItem("No results found"))
+    def load_more(self):
+        if self.next_after_id is not None:
+            self.load_page(append=True)
 
     def refresh_data(self):
-        if self.db_manager:
-            df = self.db_manager.get_all_products()
-            self.populate_table(df)
+        self.search_entry.clear()
+        self.load_page()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
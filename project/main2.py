@@ -2,80 +2,49 @@ import sys
 import os
 import cv2
 import threading
-import sqlite3
 from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-import pandas as pd
-import easyocr
-
-# Database Manager Class
-class DatabaseManager:
-    def __init__(self, db_name="machine_vision.db"):
-        self.db_name = db_name
-        self.init_database()
-
-    def init_database(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_code TEXT,
-                timestamp DATETIME,
-                camera_1_text TEXT,
-                camera_2_text TEXT,
-                camera_3_text TEXT,
-                validation_result TEXT,
-                image_path TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
-
-    def insert_product(self, product_code, cam1_text, cam2_text, cam3_text, validation, image_path):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO products (product_code, timestamp, camera_1_text, camera_2_text,
-                                  camera_3_text, validation_result, image_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (product_code, datetime.now(), cam1_text, cam2_text, cam3_text, validation, image_path))
-        product_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return product_id
-
-    def search_product(self, product_code):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM products WHERE product_code = ? ORDER BY timestamp DESC', (product_code,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
-
-    def get_all_products(self):
-        conn = sqlite3.connect(self.db_name)
-        df = pd.read_sql_query("SELECT * FROM products ORDER BY timestamp DESC", conn)
-        conn.close()
-        return df
+from database import DatabaseManager
+from excel_export import ExcelExporter
+from ocr_server import backend_for
+from product_format import ProductFormats
+from station_config import StationConfig
+from validation import ValidationEngine
+
+# PASS only if camera 1 shows INNER and the product code, camera 2 OUTER and the code, and
+# camera 3 the code with both INNER and OUTER. Per-product rules can be declared under
+# "validation" in station_config.json (see validation.py)
+CHECK_VALIDATION_RULE = {"mode": "all", "cameras": {
+    "camera_1": {"all": ["INNER", "{code}"]},
+    "camera_2": {"all": ["OUTER", "{code}"]},
+    "camera_3": {"all": ["{code}", "INNER", "OUTER"]},
+}}
+
+# OCR engine from ocr_backends.BACKENDS ("easyocr", "tesseract" or "stub")
+OCR_BACKEND = "easyocr"
 
 # OCR Manager Class
 class OCRManager:
-    def __init__(self):
+    def __init__(self, config=None, backend=OCR_BACKEND):
         os.environ['PYTHONIOENCODING'] = 'utf-8'
-        self.reader = easyocr.Reader(['en'], gpu=False, verbose=False)
+        # The shared OCR server when the station config says so, otherwise a model of our own
+        self.backend = backend_for(config, backend)
 
-    def read_text(self, frame):
+    def read_text(self, frame, product_format=None):
         if frame is None:
             return ""
         try:
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.reader.readtext(rgb_frame)
+            if product_format is None:
+                results = self.backend.readtext(rgb_frame)
+            else:
+                # Only the characters the product's labels use, and only reads that fit its format
+                results = product_format.filter(self.backend.readtext(rgb_frame, **product_format.read_options()))
             if not results:
                 return ""
-            return " | ".join([result[1] for result in results])
+            return " | ".join([text for text, _ in results])
         except Exception as e:
             print(f"OCR Error: {e}")
             return ""
@@ -120,37 +89,6 @@ class CameraManager(QThread):
         self.quit()
         self.wait()
 
-# Excel Manager Class
-class ExcelManager:
-    def __init__(self):
-        self.create_excel_file()
-
-    def create_excel_file(self):
-        today_str = datetime.now().strftime("%d-%m-%Y_%H%M%S")
-        self.filename = f"product_info_{today_str}.xlsx"
-        df = pd.DataFrame(columns=[
-            "ID", "Product Code", "Timestamp", "Camera 1 Text",
-            "Camera 2 Text", "Camera 3 Text", "Validation Result"
-        ])
-        df.to_excel(self.filename, index=False)
-
-    def append_data(self, product_id, product_code, cam1_text, cam2_text, cam3_text, validation):
-        try:
-            df = pd.read_excel(self.filename)
-            new_row = {
-                "ID": product_id,
-                "Product Code": product_code,
-                "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "Camera 1 Text": cam1_text,
-                "Camera 2 Text": cam2_text,
-                "Camera 3 Text": cam3_text,
-                "Validation Result": validation
-            }
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            df.to_excel(self.filename, index=False)
-        except Exception as e:
-            print(f"Excel write error: {e}")
-
 # Main GUI Application Class
 class MachineVisionApp(QMainWindow):
     def start_local_server(self):
@@ -177,8 +115,12 @@ class MachineVisionApp(QMainWindow):
         self.is_fullscreen = False
 
         self.db_manager = DatabaseManager()
-        self.ocr_manager = OCRManager()
-        self.excel_manager = ExcelManager()
+        self.station_config = StationConfig()
+        self.validator = ValidationEngine(CHECK_VALIDATION_RULE, self.station_config)
+        self.formats = ProductFormats(self.station_config)
+        self.ocr_manager = OCRManager(self.station_config)
+        self.excel_exporter = ExcelExporter(self.db_manager)
+        self.session_start = datetime.now()
 
         self.cameras = {}
         self.camera_frames = {}
@@ -383,7 +325,8 @@ class MachineVisionApp(QMainWindow):
             self.result_box.append("Please enter a product code to check in the database.")
             self.light_result_indicator("fail")
             return
-        result = self.db_manager.search_product(product_code)
+        results = self.db_manager.search_product(product_code)
+        result = results[0] if results else None
         if result:
             validated = result[6] if len(result) >= 7 else ''
             image_path = result if len(result) >= 8 else ''
@@ -416,7 +359,7 @@ class MachineVisionApp(QMainWindow):
             frame = self.camera_frames.get(i)
             text = ""
             if frame is not None:
-                text = self.ocr_manager.read_text(frame)
+                text = self.ocr_manager.read_text(frame, self.formats.format_for(product_code))
                 img_file = os.path.join(img_folder, f"{product_code}_cam{i+1}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg")
                 cv2.imwrite(img_file, frame)
                 image_files.append(img_file)
@@ -426,15 +369,7 @@ class MachineVisionApp(QMainWindow):
             ocr_results[i] = text
 
         # Validate conditions
-        validation_result = "FAIL"
-        if all(text != "" and text != "No feed" for text in ocr_results.values()):
-            # Check if camera texts match expected values
-            camera1_ok = "INNER" in ocr_results[0].upper() and product_code in ocr_results[0]
-            camera2_ok = "OUTER" in ocr_results[1].upper() and product_code in ocr_results[1]
-            camera3_ok = product_code in ocr_results[2] and "INNER" in ocr_results[2].upper() and "OUTER" in ocr_results[2].upper()
-
-            if camera1_ok and camera2_ok and camera3_ok:
-                validation_result = "PASS"
+        validation_result, _ = self.validator.validate(product_code, ocr_results)
 
         # Update UI
         self.light_result_indicator("pass" if validation_result == "PASS" else "fail")
@@ -447,7 +382,7 @@ class MachineVisionApp(QMainWindow):
         self.result_box.append(display_txt)
         # Save first image path with text detected
         save_img = next((img for (i, img) in enumerate(image_files) if ocr_results[i] not in ["", "No feed"]), "")
-        product_id = self.db_manager.insert_product(
+        self.db_manager.insert_product(
             product_code,
             ocr_results.get(0, ""),
             ocr_results.get(1, ""),
@@ -455,10 +390,6 @@ class MachineVisionApp(QMainWindow):
             validation_result,
             save_img
         )
-        self.excel_manager.append_data(
-            product_id, product_code,
-            ocr_results.get(0, ""), ocr_results.get(1, ""), ocr_results.get(2, ""), validation_result
-        )
 
     def stop_processing(self):
         self.processing_timer.stop()
@@ -469,14 +400,20 @@ class MachineVisionApp(QMainWindow):
         self.processing_timer.stop()
         self.entry_box.clear()
         self.result_box.clear()
-        self.excel_manager.create_excel_file()
+        self.export_session()
         self.light_result_indicator("reset")
-        self.statusBar().showMessage("New Excel file started.")
+        self.statusBar().showMessage("Session exported, new Excel record started.")
         self.result_box.append("System reset: started a new Excel record.")
 
+    def export_session(self):
+        # Write this session's inspections to its own workbook in the background
+        session_end = datetime.now()
+        filename = f"product_info_{self.session_start.strftime('%d-%m-%Y_%H%M%S')}.xlsx"
+        self.excel_exporter.export_async(self.session_start, session_end, filename)
+        self.session_start = session_end
+
     def open_database_view(self):
-        df = self.db_manager.get_all_products()
-        dialog = DatabaseViewDialog(df, self)
+        dialog = DatabaseViewDialog(self.db_manager, self)
         dialog.exec_()
 
     def open_web_view(self):
@@ -590,13 +527,17 @@ class MachineVisionApp(QMainWindow):
     def closeEvent(self, event):
         for camera in self.cameras.values():
             camera.stop()
+        self.export_session()
+        self.excel_exporter.close()
+        self.db_manager.close()
         event.accept()
 
 class DatabaseViewDialog(QDialog):
-    def __init__(self, df, parent=None):
+    def __init__(self, db_manager, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Database View")
         self.setGeometry(200, 200, 1000, 600)
+        self.db_manager = db_manager
         layout = QVBoxLayout(self)
         search_layout = QHBoxLayout()
         search_label = QLabel("Search Product Code:")
@@ -608,37 +549,31 @@ class DatabaseViewDialog(QDialog):
         search_layout.addWidget(search_btn)
         layout.addLayout(search_layout)
         self.table = QTableWidget()
-        self.populate_table(df)
+        rows, _ = self.db_manager.get_products_page(page_size=500)
+        self.populate_table(rows)
         layout.addWidget(self.table)
         close_btn = QPushButton("Close")
         close_btn.clicked.connect(self.accept)
         layout.addWidget(close_btn)
-        self.df = df
 
-    def populate_table(self, df):
-        if df.empty:
+    def populate_table(self, rows):
+        if not rows:
             self.table.setRowCount(1)
             self.table.setColumnCount(1)
             self.table.setItem(0, 0, QTableWidgetItem("No data available"))
             return
-        self.table.setRowCount(len(df))
-        self.table.setColumnCount(len(df.columns))
-        self.table.setHorizontalHeaderLabels(df.columns.tolist())
-        for i, row in df.iterrows():
-            for j, value in enumerate(row):
-                self.table.setItem(i, j, QTableWidgetItem(str(value)))
+        columns = list(rows[0].keys())
+        self.table.setRowCount(len(rows))
+        self.table.setColumnCount(len(columns))
+        self.table.setHorizontalHeaderLabels(columns)
+        for i, row in enumerate(rows):
+            for j, column in enumerate(columns):
+                self.table.setItem(i, j, QTableWidgetItem(str(row[column])))
 
     def search_product(self):
         prod_code = self.search_entry.text().strip()
-        if not self.df.empty:
-            col = 'product_code' if 'product_code' in self.df.columns else None
-            if col:
-                filtered = self.df[self.df[col] == prod_code]
-            else:
-                filtered = pd.DataFrame()
-        else:
-            filtered = pd.DataFrame()
-        self.populate_table(filtered)
+        rows, _ = self.db_manager.get_products_page(page_size=500, product_code=prod_code or None)
+        self.populate_table(rows)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -2,82 +2,95 @@ import sys
 import os
 import cv2
 import threading
-import sqlite3
+import time
 from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-import pandas as pd
-import easyocr
-
-# Database Manager Class
-class DatabaseManager:
-    def __init__(self, db_name="machine_vision.db"):
-        self.db_name = db_name
-        self.init_database()
-
-    def init_database(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_code TEXT,
-                timestamp DATETIME,
-                camera_1_text TEXT,
-                camera_2_text TEXT,
-                camera_3_text TEXT,
-                validation_result TEXT,
-                image_path TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
-
-    def insert_product(self, product_code, cam1_text, cam2_text, cam3_text, validation, image_path):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO products (product_code, timestamp, camera_1_text, camera_2_text, camera_3_text, validation_result, image_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (product_code, datetime.now(), cam1_text, cam2_text, cam3_text, validation, image_path))
-        product_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return product_id
-
-    def search_product(self, product_code):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM products WHERE product_code = ? ORDER BY timestamp DESC', (product_code,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
-
-    def get_all_products(self):
-        conn = sqlite3.connect(self.db_name)
-        df = pd.read_sql_query("SELECT * FROM products ORDER BY timestamp DESC", conn)
-        conn.close()
-        return df
+from database import DatabaseManager
+from excel_export import ExcelExporter
+from ocr_cache import OCRCache
+from ocr_server import create_ocr_service
+from product_format import ProductFormats
+from resource_governor import ResourceGovernor
+from station_config import StationConfig
+from validation import ValidationEngine
+
+# PASS if any camera shows INNER, OUTER or the product code; per-product rules can be
+# declared under "validation" in station_config.json (see validation.py)
+DEFAULT_VALIDATION_RULE = {"mode": "any", "cameras": {"*": {"any": ["INNER", "OUTER", "{code}"]}}}
+
+# OCR engine from ocr_backends.BACKENDS ("easyocr", "tesseract" or "stub")
+OCR_BACKEND = "easyocr"
+
+# During auto-processing, reuse each camera's detected text boxes while template matching
+# still finds them, so only the recognizer runs until the label moves (see box_tracker.py)
+TRACK_LABEL_BOXES = True
 
 # OCR Manager Class
 class OCRManager:
-    def __init__(self):
+    def __init__(self, config=None, workers=3, backend=OCR_BACKEND, track_boxes=TRACK_LABEL_BOXES,
+                 governor=None):
         os.environ['PYTHONIOENCODING'] = 'utf-8'
-        self.reader = easyocr.Reader(['en'], gpu=False, verbose=False)
+        self.track_boxes = track_boxes
+        # Recognition runs in the shared OCR server when the station config says so, otherwise
+        # in worker processes, each with its own warm OCR backend
+        self.service = create_ocr_service(config, workers=workers, backend=backend, governor=governor)
+        self.service.when_ready(lambda worker_ms: print(f"OCR ready in {len(worker_ms)} worker(s)"),
+                                lambda e: print(f"OCR workers failed to start: {e}"))
+        # Auto-processing re-reads still parts every second; reuse results until the picture changes
+        self.cache = OCRCache()
+        self.cache_format = None
+
+    def read_frames(self, frames, use_cache=False, accept=None, product_format=None):
+        """Returns a Future of {camera_index: result}; pass each result to format_text.
+
+        With accept(camera_index, text), the Future resolves as soon as one camera's text is
+        accepted and the other cameras' OCR is cancelled or dropped. product_format (see
+        product_format.py) constrains recognition to what the product's labels can contain.
+        """
+        if accept is not None:
+            return self.service.read_frames_until(frames, lambda i, result: accept(i, self.format_text(result)),
+                                                  product_format)
+        if use_cache:
+            # Cached reads were filtered for one product's format; a new product starts afresh
+            if product_format is not self.cache_format:
+                self.cache.invalidate()
+                self.cache_format = product_format
+            read = self.service.read_frames_tracked if self.track_boxes else self.service.read_frames
+            return self.cache.read_frames(frames, lambda changed: read(changed, product_format=product_format))
+        return self.service.read_frames(frames, product_format=product_format)
+
+    def reset(self):
+        self.cache.invalidate()
+        self.service.reset_tracks()
+
+    def cache_summary(self):
+        stats = self.cache.stats()
+        summary = f"OCR cache: {stats['hit_rate']:.0%} hits ({stats['hits']}/{stats['hits'] + stats['misses']})"
+        tracked, detected = self.service.track_stats["tracked"], self.service.track_stats["detected"]
+        if self.track_boxes and tracked + detected:
+            summary += f", detection skipped on {tracked}/{tracked + detected} reads"
+        return summary
 
     def read_text(self, frame):
         if frame is None:
             return ""
         try:
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.reader.readtext(rgb_frame)
-            if not results:
-                return ""
-            return " | ".join([result[1] for result in results])
+            return self.format_text(self.service.submit(frame).result())
         except Exception as e:
-            print(f"OCR Error: {e}")
+            return self.format_text(e)
+
+    @staticmethod
+    def format_text(result):
+        if isinstance(result, Exception):
+            print(f"OCR Error: {result}")
             return ""
+        results, _ = result
+        return " | ".join(text for text, _ in results)
+
+    def close(self):
+        self.service.close()
 
 # Camera Manager Class
 class CameraManager(QThread):
@@ -119,53 +132,23 @@ class CameraManager(QThread):
         self.quit()
         self.wait()
 
-# Excel Manager Class
-class ExcelManager:
-    def __init__(self):
-        self.create_excel_file()
-
-    def create_excel_file(self):
-        today_str = datetime.now().strftime("%d-%m-%Y_%H%M%S")
-        self.filename = f"product_info_{today_str}.xlsx"
-        df = pd.DataFrame(columns=[
-            "ID", "Product Code", "Timestamp", "Camera 1 Text", 
-            "Camera 2 Text", "Camera 3 Text", "Validation Result"
-        ])
-        df.to_excel(self.filename, index=False)
-
-    def append_data(self, product_id, product_code, cam1_text, cam2_text, cam3_text, validation):
-        try:
-            df = pd.read_excel(self.filename)
-            new_row = {
-                "ID": product_id,
-                "Product Code": product_code,
-                "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "Camera 1 Text": cam1_text,
-                "Camera 2 Text": cam2_text,
-                "Camera 3 Text": cam3_text,
-                "Validation Result": validation
-            }
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            df.to_excel(self.filename, index=False)
-        except Exception as e:
-            print(f"Excel write error: {e}")
-
 # Database View Dialog
 class DatabaseViewDialog(QDialog):
-    def __init__(self, df, parent=None):
+    def __init__(self, rows, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Database View")
         self.setGeometry(200, 200, 1000, 600)
 
         layout = QVBoxLayout(self)
         table = QTableWidget()
-        table.setRowCount(len(df))
-        table.setColumnCount(len(df.columns))
-        table.setHorizontalHeaderLabels(df.columns)
+        columns = list(rows[0].keys()) if rows else []
+        table.setRowCount(len(rows))
+        table.setColumnCount(len(columns))
+        table.setHorizontalHeaderLabels(columns)
 
-        for i, row in df.iterrows():
-            for j, value in enumerate(row):
-                table.setItem(i, j, QTableWidgetItem(str(value)))
+        for i, row in enumerate(rows):
+            for j, column in enumerate(columns):
+                table.setItem(i, j, QTableWidgetItem(str(row[column])))
 
         layout.addWidget(table)
 
@@ -175,6 +158,8 @@ class DatabaseViewDialog(QDialog):
 
 # Main GUI Application Class
 class MachineVisionApp(QMainWindow):
+    ocr_finished = pyqtSignal(object)  # (handler, future, frames, args) from the OCR pool
+
     def start_local_server(self):
         import subprocess
         import sys
@@ -192,8 +177,16 @@ class MachineVisionApp(QMainWindow):
         super().__init__()
         self.is_fullscreen = False
         self.db_manager = DatabaseManager()
-        self.ocr_manager = OCRManager()
-        self.excel_manager = ExcelManager()
+        self.station_config = StationConfig()
+        self.validator = ValidationEngine(DEFAULT_VALIDATION_RULE, self.station_config)
+        self.formats = ProductFormats(self.station_config)
+        # Keep this process (GUI, camera threads) off the cores the OCR workers are given
+        self.governor = ResourceGovernor(self.station_config)
+        self.governor.apply("capture")
+        print(self.governor.describe())
+        self.ocr_manager = OCRManager(self.station_config, governor=self.governor)
+        self.excel_exporter = ExcelExporter(self.db_manager)
+        self.session_start = datetime.now()
         self.cameras = {}
         self.camera_frames = {}
         self.camera_labels = {}
@@ -202,6 +195,9 @@ class MachineVisionApp(QMainWindow):
         self.processing_timer = QTimer()
         self.processing_timer.timeout.connect(self.process_ocr)
         self.ocr_interval = 1000  # Keep for reference but won't be used automatically
+        self.ocr_pending = False
+        self.ocr_finished.connect(self.deliver_ocr)
+        self.part_latency_ms = {"early exit": [], "full": []}
 
         self.init_ui()
         self.setup_menu()
@@ -419,6 +415,32 @@ class MachineVisionApp(QMainWindow):
         self.web_btn.clicked.connect(self.open_web_view)
         self.check_btn.clicked.connect(self.check_and_process_ocr)  # New connection
 
+    def run_ocr(self, frames, handler, *args, use_cache=False, accept=None, product_code=None):
+        """Recognize {camera_index: frame} in the OCR pool, then call handler(ocr_results, *args) here.
+
+        Cameras without a frame are reported as "No feed", and cameras dropped by an early
+        exit (see OCRManager.read_frames) as "Skipped".
+        """
+        self.ocr_pending = True
+        product_format = self.formats.format_for(product_code)
+        future = self.ocr_manager.read_frames({i: frame for i, frame in frames.items() if frame is not None},
+                                              use_cache=use_cache, accept=accept, product_format=product_format)
+        # The callback runs on a pool thread; the signal hands the result to the GUI thread
+        future.add_done_callback(lambda f: self.ocr_finished.emit((handler, f, frames, args)))
+
+    def deliver_ocr(self, payload):
+        handler, future, frames, args = payload
+        self.ocr_pending = False
+        try:
+            results = future.result()
+            ocr_results = {i: self.ocr_manager.format_text(results[i]) if i in results
+                           else "No feed" if frames[i] is None else "Skipped"
+                           for i in sorted(frames)}
+            handler(ocr_results, *args)
+        except Exception as e:
+            print(f"OCR processing error: {e}")
+            self.result_box.append(f"OCR Processing Error: {str(e)}")
+
     def check_and_process_ocr(self):
         """Process OCR on demand when Check button is clicked - FIXED VALIDATION"""
         product_code = self.entry_box.text().strip()
@@ -426,69 +448,48 @@ class MachineVisionApp(QMainWindow):
             self.result_box.append("Please enter a product code before checking.")
             self.light_result_indicator("fail")
             return
+        if self.ocr_pending:
+            self.result_box.append("Previous check is still running, please wait.")
+            return
 
-        ocr_results = {}
+        # Snapshot the frames so saved images match the recognized text
+        frames = {i: self.camera_frames.get(i) for i in range(3)}
+        self.statusBar().showMessage("Reading cameras...")
+        early_exit = self.early_exit_action.isChecked()
+        # Stop waiting for the other cameras once one decides the part: a pass under an "any"
+        # rule, a failure under an "all" rule
+        accept = (lambda i, text: self.validator.decides(product_code, i, text)) if early_exit else None
+        self.run_ocr(frames, self.finish_check, product_code, frames, time.perf_counter(), early_exit,
+                     accept=accept, product_code=product_code)
+
+    def record_part_latency(self, started, early_exit):
+        latency_ms = (time.perf_counter() - started) * 1000
+        mode = "early exit" if early_exit else "full"
+        self.part_latency_ms[mode].append(latency_ms)
+        summary = ", ".join(f"{name} avg {sum(values) / len(values):.0f} ms over {len(values)} parts"
+                            for name, values in self.part_latency_ms.items() if values)
+        print(f"Part latency {latency_ms:.0f} ms ({mode}); {summary}")
+        return latency_ms
+
+    def finish_check(self, ocr_results, product_code, frames, started=None, early_exit=False):
+        latency_ms = self.record_part_latency(started, early_exit) if started is not None else None
         img_folder = "images"
         os.makedirs(img_folder, exist_ok=True)
         image_files = []
 
-        # Process each camera
-        for i in range(3):
-            frame = self.camera_frames.get(i)
-            text = ""
-            if frame is not None:
-                text = self.ocr_manager.read_text(frame)
-            else:
-                text = "No feed"
-            ocr_results[i] = text
-
-        # NEW VALIDATION LOGIC - FIXED
-        validation_result = "FAIL"
-        any_camera_passed = False
-
         print(f"DEBUG: Product code: '{product_code}'")
         print(f"DEBUG: OCR results: {ocr_results}")
 
-        # Check each camera
-        for i, text in ocr_results.items():
-            print(f"DEBUG: Checking camera {i+1}: '{text}'")
-
-            # Skip cameras with no feed or empty text
-            if text == "" or text == "No feed":
-                print(f"DEBUG: Camera {i+1} skipped (no feed or empty)")
-                continue
-
-            # Convert to uppercase for case-insensitive comparison
-            text_upper = text.upper()
-            product_code_upper = product_code.upper()
-
-            # Check if this camera found any of the required keywords
-            has_inner = "INNER" in text_upper
-            has_outer = "OUTER" in text_upper  
-            has_product_code = product_code_upper in text_upper
-
-            print(f"DEBUG: Camera {i+1} - INNER: {has_inner}, OUTER: {has_outer}, Product: {has_product_code}")
-
-            camera_found_keyword = has_inner or has_outer or has_product_code
-
-            if camera_found_keyword:
-                any_camera_passed = True
-                print(f"DEBUG: Camera {i+1} PASSED! Setting validation to PASS")
-                break  # At least one camera passed, we can stop checking
-
-        # Set result based on whether any camera passed
-        if any_camera_passed:
-            validation_result = "PASS"
-        else:
-            validation_result = "FAIL"
-
+        # No feed, empty and early-exit "Skipped" cameras never pass
+        validation_result, camera_passed = self.validator.validate(product_code, ocr_results)
+        print(f"DEBUG: Cameras passed: {camera_passed}")
         print(f"DEBUG: Final validation result: {validation_result}")
 
         # Only save images if validation fails
         save_img = ""
         if validation_result == "FAIL":
             for i in range(3):
-                frame = self.camera_frames.get(i)
+                frame = frames.get(i)
                 if frame is not None:
                     img_file = os.path.join(img_folder, f"{product_code}_cam{i+1}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg")
                     cv2.imwrite(img_file, frame)
@@ -508,9 +509,13 @@ class MachineVisionApp(QMainWindow):
             display_txt += "No images saved (PASS result)\n"
 
         self.result_box.append(display_txt)
+        if latency_ms is not None:
+            self.statusBar().showMessage(f"Check finished: {validation_result} in {latency_ms:.0f} ms")
+        else:
+            self.statusBar().showMessage(f"Check finished: {validation_result}")
 
-        # Save to database and Excel
-        product_id = self.db_manager.insert_product(
+        # Save to database (Excel reports are exported from it on demand)
+        self.db_manager.insert_product(
             product_code,
             ocr_results.get(0, ""),
             ocr_results.get(1, ""),
@@ -519,15 +524,6 @@ class MachineVisionApp(QMainWindow):
             save_img
         )
 
-        self.excel_manager.append_data(
-            product_id,
-            product_code,
-            ocr_results.get(0, ""),
-            ocr_results.get(1, ""),
-            ocr_results.get(2, ""),
-            validation_result
-        )
-
         self.light_result_indicator("pass" if validation_result == "PASS" else "fail")
 
     def check_product(self):
@@ -537,7 +533,8 @@ class MachineVisionApp(QMainWindow):
             self.light_result_indicator("fail")
             return
 
-        result = self.db_manager.search_product(product_code)
+        results = self.db_manager.search_product(product_code)
+        result = results[0] if results else None
         if result:
             validated = result[6] if len(result) >= 7 else ''
             image_path = result[7] if len(result) >= 8 else ''
@@ -563,55 +560,29 @@ class MachineVisionApp(QMainWindow):
     def process_ocr(self):
         """Original OCR processing method - FIXED VALIDATION"""
         product_code = self.entry_box.text().strip()
-        ocr_results = {}
+        if self.ocr_pending:
+            # The timer fires again once the current frames are done
+            return
+
         img_folder = "images"
         os.makedirs(img_folder, exist_ok=True)
         image_files = []
 
-        # Process each camera
-        for i in range(3):
-            frame = self.camera_frames.get(i)
-            text = ""
+        frames = {i: self.camera_frames.get(i) for i in range(3)}
+        for i, frame in frames.items():
             if frame is not None:
-                text = self.ocr_manager.read_text(frame)
                 img_file = os.path.join(img_folder, f"{product_code}_cam{i+1}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg")
                 cv2.imwrite(img_file, frame)
                 image_files.append(img_file)
             else:
-                text = "No feed"
                 image_files.append("")
-            ocr_results[i] = text
-
-        # NEW VALIDATION LOGIC - FIXED (same as check_and_process_ocr)
-        validation_result = "FAIL"
-        any_camera_passed = False
-
-        # Check each camera
-        for i, text in ocr_results.items():
-            # Skip cameras with no feed or empty text
-            if text == "" or text == "No feed":
-                continue
 
-            # Convert to uppercase for case-insensitive comparison
-            text_upper = text.upper()
-            product_code_upper = product_code.upper()
+        self.run_ocr(frames, self.finish_process, product_code, image_files, use_cache=True,
+                     product_code=product_code)
 
-            # Check if this camera found any of the required keywords
-            has_inner = "INNER" in text_upper
-            has_outer = "OUTER" in text_upper  
-            has_product_code = product_code_upper in text_upper
-
-            camera_found_keyword = has_inner or has_outer or has_product_code
-
-            if camera_found_keyword:
-                any_camera_passed = True
-                break  # At least one camera passed, we can stop checking
-
-        # Set result based on whether any camera passed
-        if any_camera_passed:
-            validation_result = "PASS"
-        else:
-            validation_result = "FAIL"
+    def finish_process(self, ocr_results, product_code, image_files):
+        # Same rule as check_and_process_ocr
+        validation_result, _ = self.validator.validate(product_code, ocr_results)
 
         self.light_result_indicator("pass" if validation_result == "PASS" else "fail")
 
@@ -621,10 +592,11 @@ class MachineVisionApp(QMainWindow):
             display_txt += f"Camera {i+1}: {txt}\n"
         display_txt += f"Status: {validation_result}\n"
         self.result_box.append(display_txt)
+        self.statusBar().showMessage(f"Auto-processing - {self.ocr_manager.cache_summary()}")
 
         save_img = next((img for (i, img) in enumerate(image_files) if ocr_results[i] not in ["", "No feed"]), "")
         
-        product_id = self.db_manager.insert_product(
+        self.db_manager.insert_product(
             product_code,
             ocr_results.get(0, ""),
             ocr_results.get(1, ""),
@@ -633,15 +605,6 @@ class MachineVisionApp(QMainWindow):
             save_img
         )
 
-        self.excel_manager.append_data(
-            product_id,
-            product_code,
-            ocr_results.get(0, ""),
-            ocr_results.get(1, ""),
-            ocr_results.get(2, ""),
-            validation_result
-        )
-
     def stop_processing(self):
         self.processing_timer.stop()
         self.result_box.append("Stopped OCR auto-processing.")
@@ -651,14 +614,23 @@ class MachineVisionApp(QMainWindow):
         self.processing_timer.stop()
         self.entry_box.clear()
         self.result_box.clear()
-        self.excel_manager.create_excel_file()
+        self.ocr_manager.reset()
+        self.export_session()
         self.light_result_indicator("reset")
-        self.statusBar().showMessage("New Excel file started.")
+        self.statusBar().showMessage("Session exported, new Excel record started.")
         self.result_box.append("System reset: started a new Excel record.")
 
+    def export_session(self):
+        # Write this session's inspections to its own workbook in the background
+        session_end = datetime.now()
+        filename = f"product_info_{self.session_start.strftime('%d-%m-%Y_%H%M%S')}.xlsx"
+        self.excel_exporter.export_async(self.session_start, session_end, filename)
+        self.session_start = session_end
+
     def open_database_view(self):
-        df = self.db_manager.get_all_products()
-        dialog = DatabaseViewDialog(df, self)
+        # Latest page only; the full history is available through get_products_page
+        rows, _ = self.db_manager.get_products_page(page_size=500)
+        dialog = DatabaseViewDialog(rows, self)
         dialog.exec_()
 
     def open_web_view(self):
@@ -707,6 +679,13 @@ class MachineVisionApp(QMainWindow):
         fullscreen_action.triggered.connect(self.toggle_fullscreen)
         view_menu.addAction(fullscreen_action)
 
+        # Settings menu
+        settings_menu = menubar.addMenu('Settings')
+        self.early_exit_action = QAction('Early Exit Validation', self)
+        self.early_exit_action.setCheckable(True)
+        self.early_exit_action.setChecked(True)
+        settings_menu.addAction(self.early_exit_action)
+
         # About menu
         about_menu = menubar.addMenu('About')
         about_action = QAction('About', self)
@@ -784,6 +763,11 @@ class MachineVisionApp(QMainWindow):
     def closeEvent(self, event):
         for camera in self.cameras.values():
             camera.stop()
+        self.processing_timer.stop()
+        self.ocr_manager.close()
+        self.export_session()
+        self.excel_exporter.close()
+        self.db_manager.close()
         event.accept()
 
 # Main execution
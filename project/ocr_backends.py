@@ -0,0 +1,127 @@
+import os
+import time
+
+import cv2
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+
+def common_size(images):
+    """easyocr's readtext_batched needs one image size; mixed sizes are resized to the largest."""
+    shapes = {image.shape[:2] for image in images}
+    if len(shapes) == 1:
+        return {}
+    return {"n_height": max(h for h, _ in shapes), "n_width": max(w for _, w in shapes)}
+
+
+# OCR Backend Class
+class OCRBackend:
+    """Interface every OCR engine implements. Images are RGB numpy arrays.
+
+    readtext returns a list of (text, confidence) pairs with confidence in [0, 1].
+    allowlist limits the characters recognized and decoder picks the decoding strategy
+    where the engine has one (see product_format.py); engines ignore what they lack.
+    """
+    name = "base"
+    # Engines that can detect text boxes and recognize given boxes separately (see box_tracker.py)
+    supports_boxes = False
+
+    def readtext(self, image, allowlist=None, decoder=None):
+        raise NotImplementedError
+
+    def detect(self, image):
+        """Text boxes in image as [x_min, x_max, y_min, y_max] lists."""
+        raise NotImplementedError
+
+    def recognize(self, image, boxes, allowlist=None, decoder=None):
+        """readtext restricted to boxes from detect(), skipping detection."""
+        raise NotImplementedError
+
+    def readtext_batched(self, images, allowlist=None, decoder=None):
+        """Results for several images; engines without a batched path just loop."""
+        return [self.readtext(image, allowlist, decoder) for image in images]
+
+
+class EasyOCRBackend(OCRBackend):
+    """The default engine: easyocr's CRAFT detector and CRNN recognizer on torch."""
+    name = "easyocr"
+    supports_boxes = True
+
+    def __init__(self, languages=("en",), gpu=False, torch_threads=None):
+        os.environ['PYTHONIOENCODING'] = 'utf-8'
+        import easyocr
+        if torch_threads:
+            import torch
+            torch.set_num_threads(torch_threads)
+        self.reader = easyocr.Reader(list(languages), gpu=gpu, verbose=False)
+
+    def readtext(self, image, allowlist=None, decoder=None):
+        results = self.reader.readtext(image, allowlist=allowlist, decoder=decoder or "greedy")
+        return [(text, float(confidence)) for _, text, confidence in results]
+
+    def detect(self, image):
+        horizontal, free = self.reader.detect(image)
+        # Rotated text comes back as free-form polygons, which cannot be tracked as boxes
+        if free[0]:
+            return None
+        return [[int(value) for value in box] for box in horizontal[0]]
+
+    def recognize(self, image, boxes, allowlist=None, decoder=None):
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        results = self.reader.recognize(gray, horizontal_list=boxes, free_list=[], allowlist=allowlist,
+                                        decoder=decoder or "greedy")
+        return [(text, float(confidence)) for _, text, confidence in results]
+
+    def readtext_batched(self, images, allowlist=None, decoder=None):
+        batches = self.reader.readtext_batched(list(images), batch_size=len(images), allowlist=allowlist,
+                                               decoder=decoder or "greedy", **common_size(images))
+        return [[(text, float(confidence)) for _, text, confidence in results] for results in batches]
+
+
+class TesseractBackend(OCRBackend):
+    """Tesseract through pytesseract (needs the tesseract binary on PATH)."""
+    name = "tesseract"
+
+    def __init__(self, languages=("en",), gpu=False, config="--psm 11"):
+        if pytesseract is None:
+            raise RuntimeError("The tesseract backend needs pytesseract; install it and the tesseract binary")
+        # Tesseract names English "eng"; other codes are passed through
+        self.lang = "+".join("eng" if language == "en" else language for language in languages)
+        self.config = config
+
+    def readtext(self, image, allowlist=None, decoder=None):
+        config = self.config
+        if allowlist:
+            config += f" -c tessedit_char_whitelist={allowlist}"
+        data = pytesseract.image_to_data(image, lang=self.lang, config=config,
+                                         output_type=pytesseract.Output.DICT)
+        return [(text.strip(), float(confidence) / 100)
+                for text, confidence in zip(data["text"], data["conf"])
+                if text.strip() and float(confidence) >= 0]
+
+
+class StubBackend(OCRBackend):
+    """Returns fixed text without looking at the image, for tests and pipeline timing."""
+    name = "stub"
+
+    def __init__(self, languages=("en",), gpu=False, text="", delay=0.0):
+        self.text = text
+        self.delay = delay
+
+    def readtext(self, image, allowlist=None, decoder=None):
+        if self.delay:
+            time.sleep(self.delay)
+        return [(self.text, 1.0)] if self.text else []
+
+
+BACKENDS = {backend.name: backend for backend in (EasyOCRBackend, TesseractBackend, StubBackend)}
+
+
+def create_backend(name="easyocr", **options):
+    """Build the backend registered under name; options go to its constructor."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
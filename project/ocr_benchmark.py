@@ -0,0 +1,182 @@
+"""OCR benchmarks.
+
+Per-part latency, one readtext call per camera vs one batched call for all cameras:
+    python ocr_benchmark.py cam1.jpg cam2.jpg cam3.jpg --parts 20
+    python ocr_benchmark.py --cameras 0 1 2 --parts 20 --pool
+
+Backend comparison over a fixed image set (a folder of images plus labels.csv with
+"file,text" rows giving the text each image must read as):
+    python ocr_benchmark.py --dataset ocr_samples --backends easyocr tesseract stub
+    python ocr_benchmark.py --dataset ocr_samples --backends easyocr --allowlist default
+"""
+import argparse
+import csv
+import os
+import statistics
+import time
+
+import cv2
+
+from ocr_backends import BACKENDS, create_backend
+from ocr_service import OCRService
+from product_format import DEFAULT_ALLOWLIST
+
+
+def load_frames(args):
+    if args.images:
+        frames = [cv2.imread(path) for path in args.images]
+        missing = [path for path, frame in zip(args.images, frames) if frame is None]
+        if missing:
+            raise SystemExit(f"Could not read: {', '.join(missing)}")
+        return frames
+
+    frames = []
+    for camera_id in args.cameras:
+        cap = cv2.VideoCapture(camera_id)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        ret, frame = cap.read()
+        cap.release()
+        if not ret:
+            raise SystemExit(f"Camera {camera_id} returned no frame")
+        frames.append(frame)
+    return frames
+
+
+def load_dataset(folder):
+    """[(file name, RGB image, expected text)] from folder/labels.csv, in file order."""
+    labels_path = os.path.join(folder, "labels.csv")
+    if not os.path.exists(labels_path):
+        raise SystemExit(f"{labels_path} not found (expected rows of: file,text)")
+    samples = []
+    with open(labels_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            image = cv2.imread(os.path.join(folder, row["file"]))
+            if image is None:
+                raise SystemExit(f"Could not read {row['file']}")
+            samples.append((row["file"], cv2.cvtColor(image, cv2.COLOR_BGR2RGB), row["text"]))
+    return sorted(samples, key=lambda sample: sample[0])
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(name, timings):
+    print(f"{name:<22} mean {statistics.mean(timings):8.1f} ms   median {statistics.median(timings):8.1f} ms"
+          f"   p95 {percentile(timings, 0.95):8.1f} ms")
+
+
+def time_parts(run, parts):
+    run()  # first call pays for lazy initialisation; leave it out
+    timings = []
+    for _ in range(parts):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def compact(text):
+    return "".join(text.upper().split())
+
+
+def substring_distance(pattern, text):
+    """Fewest edits needed to make pattern appear somewhere in text."""
+    previous = [0] * (len(text) + 1)
+    for i, pattern_char in enumerate(pattern, 1):
+        current = [i] + [0] * len(text)
+        for j, text_char in enumerate(text, 1):
+            current[j] = min(previous[j - 1] + (pattern_char != text_char), previous[j] + 1, current[j - 1] + 1)
+        previous = current
+    return min(previous)
+
+
+def benchmark_backend(name, samples, repeat, options, allowlist=None):
+    try:
+        backend = create_backend(name, **options)
+    except Exception as e:
+        print(f"{name:<10} unavailable: {e}")
+        return
+
+    backend.readtext(samples[0][1])  # warm-up, not timed
+    timings, reads, char_errors = [], 0, []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for _, image, expected in samples:
+            begin = time.perf_counter()
+            results = backend.readtext(image, allowlist=allowlist)
+            timings.append((time.perf_counter() - begin) * 1000)
+
+            text, target = compact(" ".join(text for text, _ in results)), compact(expected)
+            if target in text:
+                reads += 1
+            char_errors.append(substring_distance(target, text) / max(1, len(target)))
+    elapsed = time.perf_counter() - started
+
+    total = len(timings)
+    print(f"{name:<10} p50 {percentile(timings, 0.5):8.1f} ms  p95 {percentile(timings, 0.95):8.1f} ms"
+          f"  p99 {percentile(timings, 0.99):8.1f} ms  {total / elapsed:6.2f} img/s"
+          f"  read rate {reads / total:6.1%}  CER {statistics.mean(char_errors):6.1%}")
+
+
+def run_backends(args):
+    samples = load_dataset(args.dataset)
+    allowlist = DEFAULT_ALLOWLIST if args.allowlist == "default" else args.allowlist
+    print(f"{len(samples)} images x {args.repeat} runs from {args.dataset}"
+          + (f", allowlist {allowlist}" if allowlist else ""))
+    for name in args.backends:
+        options = {"gpu": args.gpu} if name == "easyocr" else {}
+        benchmark_backend(name, samples, args.repeat, options, allowlist)
+
+
+def run_parts(args):
+    frames = load_frames(args)
+    print(f"{len(frames)} frames per part, {args.parts} parts, backend {args.backend}")
+
+    backend = create_backend(args.backend, **({"gpu": args.gpu} if args.backend == "easyocr" else {}))
+    rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+
+    report("loop (current)", time_parts(lambda: [backend.readtext(frame) for frame in rgb_frames], args.parts))
+    report("batched", time_parts(lambda: backend.readtext_batched(rgb_frames), args.parts))
+
+    if args.pool:
+        service = OCRService(workers=len(frames), gpu=args.gpu, backend=args.backend)
+        try:
+            for future in service.warm_up():
+                future.result()
+            keyed = dict(enumerate(frames))
+            report("pool, one per camera", time_parts(lambda: service.read_frames(keyed).result(), args.parts))
+            report("pool, batched", time_parts(lambda: service.read_frames(keyed, batched=True).result(),
+                                               args.parts))
+            # Same frames every part, so after the first detection only recognition runs
+            report("pool, tracked boxes", time_parts(lambda: service.read_frames_tracked(keyed).result(),
+                                                     args.parts))
+        finally:
+            service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="one image per camera")
+    parser.add_argument("--cameras", nargs="*", type=int, default=[0, 1, 2], help="camera ids when no images given")
+    parser.add_argument("--parts", type=int, default=20, help="number of parts (frame sets) to time")
+    parser.add_argument("--pool", action="store_true", help="also time the OCRService worker pool")
+    parser.add_argument("--backend", default="easyocr", choices=sorted(BACKENDS), help="engine for the part benchmark")
+    parser.add_argument("--dataset", help="folder with images and labels.csv; compares --backends on it")
+    parser.add_argument("--backends", nargs="*", default=sorted(BACKENDS), choices=sorted(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the dataset per backend")
+    parser.add_argument("--allowlist", help='characters to recognize in --dataset mode ("default" for labels)')
+    parser.add_argument("--gpu", action="store_true")
+    args = parser.parse_args()
+
+    os.environ['PYTHONIOENCODING'] = 'utf-8'
+    if args.dataset:
+        run_backends(args)
+    else:
+        run_parts(args)
+
+
+if __name__ == "__main__":
+    main()
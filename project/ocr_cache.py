@@ -0,0 +1,97 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+
+
+def frame_hash(frame, size=16):
+    """Difference hash of a BGR frame: one bit per horizontal brightness step on a size x size grid."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# OCR Cache Class
+class OCRCache:
+    """Reuses the last OCR result of a camera while its picture stays the same.
+
+    A frame counts as unchanged when its hash is within max_distance bits of the hash
+    that produced the cached result and that result is younger than max_age seconds.
+    """
+
+    def __init__(self, max_distance=6, max_age=30):
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.entries = {}  # camera -> (hash, result, stored at)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, camera, frame):
+        """Returns (hash, cached result or None) and counts the hit or miss."""
+        current = frame_hash(frame)
+        with self.lock:
+            entry = self.entries.get(camera)
+            if (entry and hamming(entry[0], current) <= self.max_distance
+                    and time.time() - entry[2] < self.max_age):
+                self.hits += 1
+                return current, entry[1]
+            self.misses += 1
+            return current, None
+
+    def store(self, camera, current_hash, result):
+        with self.lock:
+            self.entries[camera] = (current_hash, result, time.time())
+
+    def invalidate(self, camera=None):
+        with self.lock:
+            if camera is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(camera, None)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+    def read_frames(self, frames, read):
+        """Answer {camera: frame} from the cache where possible and send the rest to read().
+
+        read takes {camera: frame} and returns a Future of {camera: result or exception},
+        like OCRService.read_frames. Returns a Future of the merged results; failed reads
+        are not cached.
+        """
+        hashes, results, changed = {}, {}, {}
+        for camera, frame in frames.items():
+            hashes[camera], cached = self.lookup(camera, frame)
+            if cached is None:
+                changed[camera] = frame
+            else:
+                results[camera] = cached
+
+        combined = Future()
+        if not changed:
+            combined.set_result(results)
+            return combined
+
+        def done(future):
+            try:
+                fresh = future.result()
+            except Exception as e:
+                fresh = {camera: e for camera in changed}
+            for camera, result in fresh.items():
+                if not isinstance(result, Exception):
+                    self.store(camera, hashes[camera], result)
+            results.update(fresh)
+            combined.set_result(results)
+
+        read(changed).add_done_callback(done)
+        return combined
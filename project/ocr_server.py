@@ -0,0 +1,363 @@
+"""Shared OCR server: one OCR model per machine for every station app.
+
+Start it once, with a shared secret in OCR_SERVER_AUTHKEY (or "authkey" under
+"ocr_server" in station_config.json):
+    OCR_SERVER_AUTHKEY=... python ocr_server.py
+    OCR_SERVER_AUTHKEY=... python ocr_server.py --address /tmp/ocr.sock   (Unix socket)
+and set "ocr_server": {"mode": "client"} in each app's station_config.json, with the same
+secret; apps then send their frames here instead of loading their own model (see
+create_ocr_service and backend_for). Messages are pickled, so anyone holding the secret can
+run code in the server: keep it secret and bind to another interface only when needed.
+"""
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+import cv2
+
+from ocr_backends import BACKENDS, OCRBackend, create_backend
+from ocr_service import OCRService, warm_up_backend
+from station_config import StationConfig
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+# Environment variable holding the shared secret; it takes precedence over the station config
+AUTHKEY_ENV = "OCR_SERVER_AUTHKEY"
+
+# Frames from all clients arriving within this window are recognized in one batch
+BATCH_WINDOW = 0.01
+MAX_BATCH = 8
+
+
+def parse_address(address):
+    """"host:port" for TCP, a filesystem path for a Unix socket or \\\\.\\pipe\\name on Windows."""
+    if address.startswith("unix:"):
+        return address[len("unix:"):]
+    if address.startswith(("/", "\\\\")):
+        return address
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+def server_settings(config):
+    """(mode, address, authkey) from the station config; authkey is None when none is set."""
+    settings = (config.data.get("ocr_server") or {}) if config else {}
+    authkey = os.environ.get(AUTHKEY_ENV) or settings.get("authkey") or None
+    return settings.get("mode", "local"), settings.get("address", DEFAULT_ADDRESS), authkey
+
+
+def require_authkey(authkey):
+    if not authkey:
+        raise ValueError(f"No OCR server authkey configured; set {AUTHKEY_ENV} or \"authkey\" under "
+                         "\"ocr_server\" in the station config")
+    return authkey.encode()
+
+
+# Pending Request Class
+class PendingRequest:
+    """Collects the results for one client request whose frames may land in several batches."""
+
+    def __init__(self, request_id, size, reply):
+        self.request_id = request_id
+        self.results = [None] * size
+        self.remaining = size
+        self.reply = reply
+        self.lock = threading.Lock()
+
+    def set(self, index, value):
+        with self.lock:
+            self.results[index] = value
+            self.remaining -= 1
+            finished = self.remaining == 0
+        if finished:
+            self.reply(("result", self.request_id, self.results))
+
+
+# OCR Server Class
+class OCRServer:
+    """Loads one OCR backend and serves every client connection from it.
+
+    Messages are pickled tuples over multiprocessing.connection:
+        ("ping", id)                        -> ("pong", id, (pid, {"import", "model", "warm_up": ms}))
+        ("read", id, [BGR frame], options)  -> ("result", id, [(results, latency_ms) or exception])
+        ("close", id)                       ends the connection
+    options are the allowlist / decoder keywords of OCRBackend.readtext. Requests are queued
+    and frames of the same size and options are recognized together, up to MAX_BATCH.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, backend="easyocr", languages=("en",), gpu=False,
+                 authkey=None, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        # Checked before the model is loaded so a missing secret fails fast
+        authkey = require_authkey(authkey)
+        os.environ['PYTHONIOENCODING'] = 'utf-8'
+        self.address = address
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.stats = {"clients": 0, "frames": 0, "batches": 0}
+
+        started = time.perf_counter()
+        if backend == "easyocr":
+            import easyocr  # noqa: F401  (timed apart from building the model)
+        imported = time.perf_counter()
+        self.backend = create_backend(backend, languages=tuple(languages), gpu=gpu)
+        loaded = time.perf_counter()
+        warm_up_backend(self.backend)
+        self.startup_ms = {"import": (imported - started) * 1000, "model": (loaded - imported) * 1000,
+                           "warm_up": (time.perf_counter() - loaded) * 1000}
+        self.listener = Listener(parse_address(address), authkey=authkey)
+
+    def serve_forever(self):
+        threading.Thread(target=self.run_batches, daemon=True).start()
+        print(f"OCR server ({self.backend.name}) listening on {self.address}, model ready in "
+              f"{sum(self.startup_ms.values()):.0f} ms")
+        try:
+            while True:
+                try:
+                    connection = self.listener.accept()
+                except AuthenticationError as e:
+                    print(f"Rejected OCR client: {e}")
+                    continue
+                threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+        except KeyboardInterrupt:
+            print(f"OCR server stopped after {self.stats['frames']} frames in {self.stats['batches']} batches")
+        finally:
+            self.listener.close()
+
+    def handle(self, connection):
+        send_lock = threading.Lock()
+
+        def reply(message):
+            try:
+                with send_lock:
+                    connection.send(message)
+            except OSError:
+                pass  # the client went away; its results are dropped
+
+        self.stats["clients"] += 1
+        print(f"OCR client connected ({self.stats['clients']} connected)")
+        try:
+            while True:
+                message = connection.recv()
+                if message[0] == "close":
+                    break
+                if message[0] == "ping":
+                    reply(("pong", message[1], (os.getpid(), self.startup_ms)))
+                elif message[0] == "read":
+                    _, request_id, frames, options = message
+                    pending = PendingRequest(request_id, len(frames), reply)
+                    if not frames:
+                        reply(("result", request_id, []))
+                    for index, frame in enumerate(frames):
+                        self.requests.put((frame, options or {}, pending, index))
+        except (EOFError, OSError):
+            pass
+        finally:
+            self.stats["clients"] -= 1
+            connection.close()
+
+    def next_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run_batches(self):
+        while True:
+            groups = {}
+            for item in self.next_batch():
+                frame, options = item[0], item[1]
+                groups.setdefault((frame.shape, tuple(sorted(options.items()))), []).append(item)
+
+            for items in groups.values():
+                options = items[0][1]
+                images = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame, *_ in items]
+                started = time.perf_counter()
+                try:
+                    if len(images) == 1:
+                        batches = [self.backend.readtext(images[0], **options)]
+                    else:
+                        batches = self.backend.readtext_batched(images, **options)
+                    latency_ms = (time.perf_counter() - started) * 1000
+                    values = [(results, latency_ms) for results in batches]
+                except Exception as e:
+                    values = [RuntimeError(f"OCR server: {e}")] * len(items)
+                self.stats["frames"] += len(items)
+                self.stats["batches"] += 1
+                for (_, _, pending, index), value in zip(items, values):
+                    pending.set(index, value)
+
+
+# OCR Client Class
+class OCRClient(OCRService):
+    """OCRService that sends frames to a running OCRServer instead of loading a model.
+
+    Raises OSError (or AuthenticationError) when the server cannot be reached and ValueError
+    without an authkey. Box tracking is not available remotely, so read_frames_tracked reads
+    every frame in full.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None, batched=False):
+        self.address = address
+        self.workers = 1
+        self.batched = batched
+        self.tracks = {}
+        self.track_stats = {"tracked": 0, "detected": 0}
+        self.track_lock = threading.Lock()
+
+        self.connection = Client(parse_address(address), authkey=require_authkey(authkey))
+        self.send_lock = threading.Lock()
+        self.pending = {}
+        self.ids = itertools.count()
+        threading.Thread(target=self.receive, daemon=True).start()
+
+    def request(self, *message):
+        future = Future()
+        request_id = next(self.ids)
+        self.pending[request_id] = future
+        try:
+            with self.send_lock:
+                self.connection.send((message[0], request_id) + message[1:])
+        except OSError as e:
+            self.pending.pop(request_id, None)
+            future.set_exception(ConnectionError(f"OCR server at {self.address}: {e}"))
+        return future
+
+    def receive(self):
+        try:
+            while True:
+                _, request_id, payload = self.connection.recv()
+                future = self.pending.pop(request_id, None)
+                if future is not None:
+                    future.set_result(payload)
+        except (EOFError, OSError) as e:
+            for future in list(self.pending.values()):
+                future.set_exception(ConnectionError(f"Lost OCR server at {self.address}: {e}"))
+            self.pending.clear()
+
+    def read(self, frames, options=None, keep=None):
+        """Future of [(results, latency_ms) or exception] for a list of BGR frames."""
+        result = Future()
+
+        def done(future):
+            try:
+                values = future.result()
+            except Exception as e:
+                values = [e] * len(frames)
+            if keep is not None:
+                values = [value if isinstance(value, Exception) else (keep(value[0]), value[1]) for value in values]
+            result.set_result(values)
+
+        self.request("read", list(frames), options or {}).add_done_callback(done)
+        return result
+
+    def warm_up(self):
+        return [self.request("ping")]
+
+    def submit(self, frame, product_format=None):
+        single = Future()
+
+        def done(future):
+            value = future.result()[0]
+            if isinstance(value, Exception):
+                single.set_exception(value)
+            else:
+                single.set_result(value)
+
+        options, keep = (product_format.read_options(), product_format.filter) if product_format else ({}, None)
+        self.read([frame], options, keep).add_done_callback(done)
+        return single
+
+    def submit_batch(self, frames, product_format=None):
+        options, keep = (product_format.read_options(), product_format.filter) if product_format else ({}, None)
+        return self.read(list(frames), options, keep)
+
+    def read_frames_tracked(self, frames, product_format=None):
+        with self.track_lock:
+            self.track_stats["detected"] += len(frames)
+        return self.read_frames(frames, product_format=product_format)
+
+    def close(self):
+        try:
+            with self.send_lock:
+                self.connection.send(("close", None))
+        except OSError:
+            pass
+        self.connection.close()
+
+
+class RemoteBackend(OCRBackend):
+    """OCRBackend for apps that call readtext in-process, answered by the OCR server."""
+    name = "server"
+
+    def __init__(self, client):
+        self.client = client
+
+    def readtext(self, image, allowlist=None, decoder=None):
+        options = {key: value for key, value in (("allowlist", allowlist), ("decoder", decoder)) if value}
+        value = self.client.read([cv2.cvtColor(image, cv2.COLOR_RGB2BGR)], options).result()[0]
+        if isinstance(value, Exception):
+            raise value
+        return value[0]
+
+
+def connect(config):
+    """OCRClient when the station config selects the shared server and it answers, else None."""
+    mode, address, authkey = server_settings(config)
+    if mode != "client":
+        return None
+    try:
+        client = OCRClient(address, authkey)
+        print(f"Using the shared OCR server at {address}")
+        return client
+    except (OSError, AuthenticationError, ValueError) as e:
+        print(f"OCR server at {address} unavailable ({e}), loading a local OCR model")
+        return None
+
+
+def create_ocr_service(config=None, **options):
+    """The shared server's client in client mode, otherwise a local OCRService(**options)."""
+    return connect(config) or OCRService(**options)
+
+
+def backend_for(config=None, name="easyocr"):
+    """The shared server as an OCRBackend in client mode, otherwise create_backend(name)."""
+    client = connect(config)
+    return RemoteBackend(client) if client else create_backend(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=DEFAULT_ADDRESS,
+                        help="host:port, or a socket path (default: loopback only)")
+    parser.add_argument("--config", default="station_config.json",
+                        help=f"station config holding the authkey when {AUTHKEY_ENV} is not set")
+    parser.add_argument("--backend", default="easyocr", choices=sorted(BACKENDS))
+    parser.add_argument("--languages", nargs="*", default=["en"])
+    parser.add_argument("--gpu", action="store_true")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW, help="seconds to gather a batch")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    args = parser.parse_args()
+
+    authkey = server_settings(StationConfig(args.config))[2]
+    if not authkey:
+        parser.error(f"refusing to start without an authkey: set {AUTHKEY_ENV} or \"authkey\" under "
+                     f"\"ocr_server\" in {args.config}")
+    server = OCRServer(args.address, args.backend, args.languages, args.gpu, authkey,
+                       args.batch_window, args.max_batch)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
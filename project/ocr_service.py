@@ -0,0 +1,382 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import cv2
+
+from box_tracker import follow, make_track
+from ocr_backends import create_backend
+from resource_governor import apply_settings
+
+# Each worker process keeps its own warm OCR backend between inspections
+_backend = None
+_startup_ms = {}
+_ready_barrier = None
+
+# Longest a warm worker waits at the warm-up barrier for the others to finish loading
+WARM_UP_TIMEOUT = 600
+
+
+def _init_worker(backend, options, torch_threads, worker_settings=None, ready_barrier=None):
+    global _backend, _ready_barrier
+    _ready_barrier = ready_barrier
+    os.environ['PYTHONIOENCODING'] = 'utf-8'
+    # Thread counts and affinity from the resource governor, set before torch is imported
+    apply_settings(worker_settings or {})
+    started = time.perf_counter()
+    import numpy  # noqa: F401  (timed with the other imports)
+    if backend == "easyocr":
+        import easyocr  # noqa: F401  (timed apart from building the model)
+        # Share the cores between workers instead of every worker using all of them
+        options = dict(options, torch_threads=torch_threads)
+    imported = time.perf_counter()
+    _backend = create_backend(backend, **options)
+    loaded = time.perf_counter()
+    warm_up_backend(_backend)
+    warmed = time.perf_counter()
+
+    _startup_ms.update({"import": (imported - started) * 1000, "model": (loaded - imported) * 1000,
+                        "warm_up": (warmed - loaded) * 1000})
+
+
+def warm_up_backend(backend):
+    """The first inference allocates buffers and picks kernels; pay for it here, not on a part."""
+    import numpy as np
+    sample = np.full((64, 256, 3), 255, dtype=np.uint8)
+    cv2.putText(sample, "WARM 123", (10, 45), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    backend.readtext(sample)
+
+
+def _ping():
+    # A worker holds its ping until every worker has one, so the pings of one warm_up() land
+    # on distinct workers and answer only once the whole pool is warm
+    if _ready_barrier is not None:
+        _ready_barrier.wait(WARM_UP_TIMEOUT)
+    return os.getpid(), dict(_startup_ms)
+
+
+def _constrain(product_format):
+    """Decoder options for a product_format.ProductFormat (or None) and a filter for its reads."""
+    if product_format is None:
+        return {}, lambda results: results
+    return product_format.read_options(), product_format.filter
+
+
+def _read_frame(frame, product_format=None):
+    started = time.perf_counter()
+    options, keep = _constrain(product_format)
+    results = keep(_backend.readtext(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), **options))
+    return results, (time.perf_counter() - started) * 1000
+
+
+def _read_frame_tracked(frame, track, product_format=None):
+    """Read frame, reusing the text boxes in track when they can still be found.
+
+    Returns (results, latency_ms, track, detected): the track to pass with the camera's
+    next frame (None when it cannot be tracked) and whether the detector had to run.
+    """
+    started = time.perf_counter()
+    options, keep = _constrain(product_format)
+    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    if not _backend.supports_boxes:
+        return keep(_backend.readtext(image, **options)), (time.perf_counter() - started) * 1000, None, True
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    track = follow(track, gray)
+    detected = track is None
+    if detected:
+        boxes = _backend.detect(image)
+        if boxes is None:
+            results = _backend.readtext(image, **options)
+        else:
+            results = _backend.recognize(image, boxes, **options) if boxes else []
+            track = make_track(gray, boxes)
+    else:
+        results = _backend.recognize(image, track["boxes"], **options)
+    return keep(results), (time.perf_counter() - started) * 1000, track, detected
+
+
+def crop_roi(frame, roi):
+    """Crop frame to roi ({"x", "y", "w", "h", optional "scale"}) and upscale it if asked.
+
+    The box is clipped to the frame; an empty or missing roi returns the whole frame.
+    """
+    if not roi:
+        return frame
+    height, width = frame.shape[:2]
+    x0, y0 = max(0, int(roi["x"])), max(0, int(roi["y"]))
+    x1, y1 = min(width, x0 + int(roi["w"])), min(height, y0 + int(roi["h"]))
+    if x1 <= x0 or y1 <= y0:
+        return frame
+    crop = frame[y0:y1, x0:x1]
+    scale = float(roi.get("scale", 1.0))
+    if scale != 1.0:
+        # Small label text reads better when enlarged before detection
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    return crop
+
+
+def _read_frames_batched(frames, product_format=None):
+    started = time.perf_counter()
+    options, keep = _constrain(product_format)
+    # For easyocr this is one detector pass and one recognizer pass for every frame together
+    batches = _backend.readtext_batched([cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames], **options)
+    latency_ms = (time.perf_counter() - started) * 1000
+    return [(keep(results), latency_ms) for results in batches]
+
+
+# OCR Service Class
+class OCRService:
+    """Runs OCR in a pool of worker processes so the GUI thread never waits on recognition.
+
+    Every worker builds its backend (easyocr unless another name from ocr_backends.BACKENDS
+    is given) once at start-up. submit() returns a Future of
+    ([(text, confidence), ...], latency_ms) for one BGR frame; read_frames() recognizes the
+    frames of several cameras and returns one Future for all of them. By default each frame
+    goes to its own worker; with batched=True they are recognized in a single batched call
+    (see ocr_benchmark.py for which is faster on a given station). Every read method takes
+    an optional product_format.ProductFormat that constrains decoding and drops reads the
+    product's labels cannot contain.
+    """
+
+    def __init__(self, workers=None, languages=("en",), gpu=False, batched=False, backend="easyocr",
+                 backend_options=None, governor=None):
+        cpu_count = os.cpu_count() or 1
+        self.workers = workers or min(3, cpu_count)
+        self.batched = batched
+        # A resource_governor.ResourceGovernor decides the workers' threads and cores
+        worker_settings = governor.allocation("ocr", self.workers) if governor else {}
+        torch_threads = worker_settings.get("torch_threads") or max(1, cpu_count // self.workers)
+        options = dict(backend_options or {}, languages=tuple(languages), gpu=gpu)
+        # Spawned rather than forked: a fork would copy the GUI's Qt, camera and OpenCV threads
+        # into the workers, and torch is not fork-safe once initialized
+        context = multiprocessing.get_context("spawn")
+        self.ready_barrier = context.Barrier(self.workers)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                            initializer=_init_worker,
+                                            initargs=(backend, options, torch_threads, worker_settings,
+                                                      self.ready_barrier))
+        # Per-key text boxes for read_frames_tracked, and how often they spared the detector
+        self.tracks = {}
+        self.track_stats = {"tracked": 0, "detected": 0}
+        self.track_lock = threading.Lock()
+
+    def warm_up(self):
+        """Start every worker now so the first inspection does not pay for model loading.
+
+        Returns a list of Futures of (pid, {"import", "model", "warm_up": ms}), one per worker;
+        they resolve together once every worker has loaded its model.
+        """
+        if self.ready_barrier.broken:
+            self.ready_barrier.reset()
+        return [self.executor.submit(_ping) for _ in range(self.workers)]
+
+    def when_ready(self, callback, on_error=None):
+        """Start the workers and call callback({pid: startup ms}) on a pool thread once all are warm.
+
+        If a worker fails to start, on_error(exception) is called instead (or the failure is
+        printed), since the pool cannot serve inspections.
+        """
+        futures = self.warm_up()
+        remaining = [len(futures)]
+        timings = {}
+        errors = []
+        lock = threading.Lock()
+
+        def done(future):
+            with lock:
+                try:
+                    pid, startup_ms = future.result()
+                    timings[pid] = startup_ms
+                except Exception as e:
+                    errors.append(e)
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if not finished:
+                return
+            if errors or len(timings) < self.workers:
+                error = errors[0] if errors else RuntimeError(f"only {len(timings)} of {self.workers} OCR workers answered")
+                if on_error:
+                    on_error(error)
+                else:
+                    print(f"OCR workers failed to start: {error}")
+            else:
+                callback(timings)
+
+        for future in futures:
+            future.add_done_callback(done)
+
+    def submit(self, frame, product_format=None):
+        return self.executor.submit(_read_frame, frame, product_format)
+
+    def submit_batch(self, frames, product_format=None):
+        """Recognize a list of frames in one call on one worker; returns a Future of a list of results."""
+        return self.executor.submit(_read_frames_batched, list(frames), product_format)
+
+    def read_frames(self, frames, batched=None, product_format=None):
+        """Recognize {key: frame}; returns a Future of {key: result or exception}.
+
+        Each result is the (results, latency_ms) pair from submit(). A failed frame is
+        reported as its exception so the other cameras still come back.
+        """
+        if self.batched if batched is None else batched:
+            return self.read_frames_batched(frames, product_format)
+
+        combined = Future()
+        results = {}
+        remaining = [len(frames)]
+        lock = threading.Lock()
+
+        if not frames:
+            combined.set_result(results)
+            return combined
+
+        def done(key, future):
+            try:
+                value = future.result()
+            except Exception as e:
+                value = e
+            with lock:
+                results[key] = value
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                combined.set_result(results)
+
+        for key, frame in frames.items():
+            try:
+                future = self.submit(frame, product_format)
+            except Exception as e:  # pool already shut down or broken
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda future, key=key: done(key, future))
+        return combined
+
+    def read_frames_tracked(self, frames, product_format=None):
+        """Like read_frames, but keep each key's detected text boxes and on its next frame
+        only run recognition on them if template matching still finds them there.
+
+        Meant for a camera that keeps looking at the same label position; the detector runs
+        again whenever a box is lost (see box_tracker.py).
+        """
+        combined = Future()
+        results = {}
+        remaining = [len(frames)]
+
+        if not frames:
+            combined.set_result(results)
+            return combined
+
+        def done(key, future):
+            try:
+                ocr_results, latency_ms, track, detected = future.result()
+                value = (ocr_results, latency_ms)
+            except Exception as e:
+                value, track, detected = e, None, True
+            with self.track_lock:
+                self.tracks[key] = track
+                self.track_stats["detected" if detected else "tracked"] += 1
+                results[key] = value
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                combined.set_result(results)
+
+        for key, frame in frames.items():
+            with self.track_lock:
+                track = self.tracks.get(key)
+            try:
+                future = self.executor.submit(_read_frame_tracked, frame, track, product_format)
+            except Exception as e:
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda future, key=key: done(key, future))
+        return combined
+
+    def reset_tracks(self):
+        """Forget every tracked box, e.g. after the camera or its region changed."""
+        with self.track_lock:
+            self.tracks.clear()
+
+    def read_frames_until(self, frames, accept, product_format=None):
+        """Like read_frames, but resolve as soon as accept(key, result) is true for one frame.
+
+        Frames that have not started yet are cancelled, and ones already running finish in
+        the background and are dropped, so the result holds only the frames read so far.
+        """
+        combined = Future()
+        results = {}
+        futures = []
+        state = {"remaining": len(frames), "finished": False}
+        lock = threading.Lock()
+
+        def finish():
+            for future in futures:
+                future.cancel()
+            combined.set_result(dict(results))
+
+        def done(key, future):
+            if future.cancelled():
+                return
+            try:
+                value = future.result()
+            except Exception as e:
+                value = e
+            with lock:
+                if state["finished"]:
+                    return
+                results[key] = value
+                state["remaining"] -= 1
+                try:
+                    accepted = not isinstance(value, Exception) and accept(key, value)
+                except Exception as e:
+                    print(f"Early-exit check failed: {e}")
+                    accepted = False
+                state["finished"] = accepted or state["remaining"] == 0
+                if not state["finished"]:
+                    return
+            finish()
+
+        if not frames:
+            combined.set_result({})
+            return combined
+
+        for key, frame in frames.items():
+            with lock:
+                if state["finished"]:
+                    break
+            try:
+                future = self.submit(frame, product_format)
+            except Exception as e:
+                future = Future()
+                future.set_exception(e)
+            futures.append(future)
+            future.add_done_callback(lambda future, key=key: done(key, future))
+        return combined
+
+    def read_frames_batched(self, frames, product_format=None):
+        combined = Future()
+        keys = list(frames)
+        if not keys:
+            combined.set_result({})
+            return combined
+
+        def done(future):
+            try:
+                combined.set_result(dict(zip(keys, future.result())))
+            except Exception as e:
+                # The whole batch failed, so every camera reports the same error
+                combined.set_result({key: e for key in keys})
+
+        try:
+            future = self.submit_batch((frames[key] for key in keys), product_format)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(done)
+        return combined
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
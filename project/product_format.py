@@ -0,0 +1,90 @@
+import re
+import string
+
+# Labels carry upper-case letters, digits and a few separators; everything else is a misread
+DEFAULT_ALLOWLIST = string.ascii_uppercase + string.digits + "-/."
+
+DEFAULT_FORMAT = {"allowlist": DEFAULT_ALLOWLIST}
+
+
+# Product Format Class
+class ProductFormat:
+    """What text a product's labels can contain, used to constrain and filter OCR.
+
+    Spec format (as stored in the station config):
+        {"allowlist": "ABC...0123-",   characters the recognizer may output
+         "min_length": 3, "max_length": 12,   length of one read, spaces ignored
+         "pattern": "INNER|OUTER|[A-Z]{2}\\d{6}",   regex every read must match in full
+         "decoder": "greedy" | "beamsearch"}
+    Every key is optional. A read is one text box from the recognizer, so a pattern has to
+    allow for every kind of text on the label, not only the product code. "{code}" in a
+    pattern stands for the product code.
+    """
+
+    def __init__(self, spec, product_code=""):
+        self.allowlist = spec.get("allowlist") or None
+        self.decoder = spec.get("decoder")
+        self.min_length = spec.get("min_length", 1)
+        self.max_length = spec.get("max_length")
+        pattern = spec.get("pattern")
+        self.pattern = re.compile(pattern.replace("{code}", re.escape(product_code))) if pattern else None
+
+    def read_options(self):
+        """Keyword arguments for OCRBackend.readtext / recognize."""
+        options = {}
+        if self.allowlist:
+            options["allowlist"] = self.allowlist
+        if self.decoder:
+            options["decoder"] = self.decoder
+        return options
+
+    def clean(self, text):
+        """text reduced to the allowlist, for engines that cannot apply one while decoding.
+
+        Lower-case letters are folded to upper case when only that is allowed.
+        """
+        if self.allowlist:
+            text = "".join(char if char in self.allowlist else char.upper() for char in text)
+            text = "".join(char for char in text if char in self.allowlist or char == " ")
+        return " ".join(text.split())
+
+    def accepts(self, text):
+        compact = text.replace(" ", "")
+        if len(compact) < self.min_length:
+            return False
+        if self.max_length is not None and len(compact) > self.max_length:
+            return False
+        return self.pattern is None or self.pattern.fullmatch(text) is not None
+
+    def filter(self, results):
+        """Cleaned (text, confidence) reads, without the ones the product's labels cannot contain."""
+        cleaned = [(self.clean(text), confidence) for text, confidence in results]
+        return [(text, confidence) for text, confidence in cleaned if self.accepts(text)]
+
+
+# Product Formats Class
+class ProductFormats:
+    """Looks up the format for a product code in the station config and caches it.
+
+    Config keys under "formats": "products" maps product codes to specs and "default"
+    replaces DEFAULT_FORMAT ({} turns the constraints off).
+    """
+
+    def __init__(self, config=None):
+        self.config = config
+        self.cache = {}
+
+    def format_for(self, product_code):
+        product_code = (product_code or "").strip()
+        compiled = self.cache.get(product_code)
+        if compiled is None:
+            settings = (self.config.data.get("formats") or {}) if self.config else {}
+            spec = (settings.get("products") or {}).get(product_code)
+            if spec is None:
+                spec = settings.get("default")
+            compiled = ProductFormat(DEFAULT_FORMAT if spec is None else spec, product_code)
+            self.cache[product_code] = compiled
+        return compiled
+
+    def clear_cache(self):
+        self.cache.clear()
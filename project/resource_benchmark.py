@@ -0,0 +1,116 @@
+"""End-to-end OCR latency per part while camera capture and a vision pipeline load the CPU.
+
+Compares resource profiles (see resource_governor.py), each in a fresh process so the
+affinity set by one profile does not carry over to the next:
+    python resource_benchmark.py --parts 30
+    python resource_benchmark.py cam1.jpg cam2.jpg cam3.jpg --profiles unmanaged recommended
+
+Without images, three synthetic label frames are used.
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from ocr_backends import BACKENDS
+from ocr_benchmark import percentile, time_parts
+from ocr_service import OCRService
+from resource_governor import PROFILES, ResourceGovernor, apply_settings
+from station_config import StationConfig
+
+
+def synthetic_frames(count=3):
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = rng.integers(90, 140, (480, 640, 3), dtype=np.uint8)
+        cv2.rectangle(frame, (120, 160), (520, 320), (235, 235, 235), -1)
+        cv2.putText(frame, "INNER", (150, 220), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (20, 20, 20), 3)
+        cv2.putText(frame, f"AB12345{i}", (150, 290), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (20, 20, 20), 3)
+        frames.append(frame)
+    return frames
+
+
+def capture_load(frame, stop):
+    """What one camera thread does per frame: convert and scale for the preview, judge quality."""
+    while not stop.is_set():
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        cv2.resize(rgb, (960, 720), interpolation=cv2.INTER_LINEAR)
+        cv2.Laplacian(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var()
+        time.sleep(1 / 30)
+
+
+def vision_load(frame, stop, settings):
+    """A DAMAGE/MEASURE style pipeline running flat out in its own process."""
+    apply_settings(settings)
+    while not stop.is_set():
+        gray = cv2.equalizeHist(cv2.GaussianBlur(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (5, 5), 0))
+        edges = cv2.dilate(cv2.Canny(gray, 50, 150), None, iterations=1)
+        cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+
+def run_profile(args):
+    frames = [cv2.imread(path) for path in args.images] if args.images else synthetic_frames()
+    if any(frame is None for frame in frames):
+        raise SystemExit("Could not read every image")
+
+    governor = ResourceGovernor(StationConfig(), profile=args.profile)
+    governor.apply("capture")
+
+    stop = threading.Event()
+    cameras = [threading.Thread(target=capture_load, args=(frame, stop), daemon=True) for frame in frames]
+    vision_stop = multiprocessing.Event()
+    vision = [multiprocessing.Process(target=vision_load, args=(frames[0], vision_stop, governor.allocation("vision")),
+                                      daemon=True) for _ in range(args.vision)]
+    service = OCRService(workers=len(frames), backend=args.backend, governor=governor)
+    try:
+        for future in service.warm_up():
+            future.result()
+        for worker in cameras + vision:
+            worker.start()
+        time.sleep(1)  # let the load settle
+
+        keyed = dict(enumerate(frames))
+        timings = time_parts(lambda: service.read_frames(keyed).result(), args.parts)
+        print(f"{args.profile:<14} p50 {percentile(timings, 0.5):8.1f} ms  p95 {percentile(timings, 0.95):8.1f} ms"
+              f"  p99 {percentile(timings, 0.99):8.1f} ms  max {max(timings):8.1f} ms   ({governor.describe()})")
+    finally:
+        stop.set()
+        vision_stop.set()
+        for process in vision:
+            process.join(timeout=5)
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="one image per camera (default: synthetic labels)")
+    parser.add_argument("--profiles", nargs="*", default=["unmanaged", "recommended"],
+                        help=f"profiles to compare (built in: {', '.join(PROFILES)})")
+    parser.add_argument("--profile", help=argparse.SUPPRESS)  # one profile, run in this process
+    parser.add_argument("--parts", type=int, default=30, help="parts (frame sets) to time per profile")
+    parser.add_argument("--vision", type=int, default=1, help="vision pipeline processes to run alongside")
+    parser.add_argument("--backend", default="easyocr", choices=sorted(BACKENDS))
+    args = parser.parse_args()
+
+    os.environ['PYTHONIOENCODING'] = 'utf-8'
+    if args.profile:
+        run_profile(args)
+        return
+
+    print(f"{os.cpu_count()} cores, {len(args.images) or 3} cameras, {args.vision} vision process(es), "
+          f"{args.parts} parts per profile")
+    for profile in args.profiles:
+        subprocess.run([sys.executable, os.path.abspath(__file__), *args.images, "--profile", profile,
+                        "--parts", str(args.parts), "--vision", str(args.vision), "--backend", args.backend],
+                       check=False)
+
+
+if __name__ == "__main__":
+    main()
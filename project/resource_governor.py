@@ -0,0 +1,130 @@
+import math
+import os
+import sys
+
+import cv2
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Subsystems get their cores in this order; "rest" takes whatever the others leave
+SUBSYSTEMS = ("capture", "vision", "ocr")
+
+# "cores" is a core count, a fraction below 1 of the machine (at least one core) or "rest";
+# "pin" sets CPU affinity to those cores, otherwise only thread counts are limited
+PROFILES = {
+    # Leave torch and OpenCV to size their own thread pools, as before
+    "unmanaged": {},
+    # GUI and camera threads, the DAMAGE/MEASURE pipelines and the OCR workers each get
+    # their own cores, and OpenCV stays single-threaded everywhere
+    "recommended": {
+        "capture": {"cores": 0.25, "cv2_threads": 1},
+        "vision": {"cores": 0.125, "cv2_threads": 1},
+        "ocr": {"cores": "rest", "cv2_threads": 1},
+        "pin": True,
+    },
+    # Same split without affinity, for machines where pinning is not allowed
+    "threads_only": {
+        "capture": {"cores": 0.25, "cv2_threads": 1},
+        "vision": {"cores": 0.125, "cv2_threads": 1},
+        "ocr": {"cores": "rest", "cv2_threads": 1},
+        "pin": False,
+    },
+}
+
+# Below this many cores every subsystem shares all of them
+MIN_CORES_TO_SPLIT = 4
+
+
+def set_affinity(cpus):
+    """Pin the current process to cpus; False where the platform offers no way to."""
+    if psutil is not None:
+        psutil.Process().cpu_affinity(list(cpus))
+        return True
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(cpus))
+        return True
+    return False
+
+
+def apply_settings(settings):
+    """Apply one allocation ({"cv2_threads", "torch_threads", "cpus"}) to the current process.
+
+    Call it before torch is imported so its OpenMP pool is sized from the environment too.
+    """
+    if settings.get("cv2_threads"):
+        cv2.setNumThreads(settings["cv2_threads"])
+    if settings.get("torch_threads"):
+        for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+            os.environ[variable] = str(settings["torch_threads"])
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(settings["torch_threads"])
+    if settings.get("cpus") and not set_affinity(settings["cpus"]):
+        print("CPU affinity is not supported here; install psutil to pin processes")
+
+
+# Resource Governor Class
+class ResourceGovernor:
+    """Splits the machine's cores between camera capture, the vision pipelines and OCR.
+
+    The profile is a name from PROFILES or from "profiles" under "resources" in the
+    station config, selected by "resources" -> "profile" unless one is passed in.
+    """
+
+    def __init__(self, config=None, profile=None):
+        settings = (config.data.get("resources") or {}) if config else {}
+        profiles = dict(PROFILES, **(settings.get("profiles") or {}))
+        self.profile_name = profile or settings.get("profile") or "recommended"
+        if self.profile_name not in profiles:
+            raise ValueError(f"Unknown resource profile '{self.profile_name}', expected one of: "
+                             f"{', '.join(profiles)}")
+        self.profile = profiles[self.profile_name]
+        self.cpu_count = os.cpu_count() or 1
+
+    def cores(self):
+        """{subsystem: [cpu ids]}; subsystems missing from the profile are left out."""
+        all_cpus = list(range(self.cpu_count))
+        wanted = {name: self.profile[name].get("cores", "rest") for name in SUBSYSTEMS if name in self.profile}
+        fixed = {name: max(1, math.floor(self.cpu_count * cores)) if cores < 1 else int(cores)
+                 for name, cores in wanted.items() if cores != "rest"}
+        if self.cpu_count < MIN_CORES_TO_SPLIT or sum(fixed.values()) >= self.cpu_count:
+            return {name: all_cpus for name in wanted}
+
+        assigned, start = {}, 0
+        for name in wanted:
+            if name in fixed:
+                assigned[name] = all_cpus[start:start + fixed[name]]
+                start += fixed[name]
+        for name in wanted:
+            if name not in fixed:
+                assigned[name] = all_cpus[start:]
+        return assigned
+
+    def allocation(self, subsystem, workers=1):
+        """Settings for one process of subsystem, sharing its cores with workers - 1 others."""
+        spec = self.profile.get(subsystem)
+        if not spec:
+            return {}
+        cpus = self.cores()[subsystem]
+        settings = {"cv2_threads": spec.get("cv2_threads")}
+        if subsystem == "ocr":
+            settings["torch_threads"] = spec.get("torch_threads") or max(1, len(cpus) // workers)
+        if self.profile.get("pin") and len(cpus) < self.cpu_count:
+            settings["cpus"] = cpus
+        return settings
+
+    def apply(self, subsystem):
+        """Apply the subsystem's allocation to the current process and return it."""
+        settings = self.allocation(subsystem)
+        apply_settings(settings)
+        return settings
+
+    def describe(self):
+        if not self.profile:
+            return f"Resource profile '{self.profile_name}': no limits"
+        parts = [f"{name} cores {cpus[0]}-{cpus[-1]}" for name, cpus in self.cores().items()]
+        pinned = "pinned" if self.profile.get("pin") else "not pinned"
+        return f"Resource profile '{self.profile_name}' ({pinned}): " + ", ".join(parts)
@@ -0,0 +1,73 @@
+import copy
+import json
+import os
+
+DEFAULT_CONFIG = {
+    # OCR regions per camera: {"camera_1": {"x": 0, "y": 0, "w": 640, "h": 480, "scale": 1.0}}
+    "rois": {},
+    # Text validation (see validation.py): per product-code rules, or a "default" that
+    # replaces the application's built-in rule
+    "validation": {
+        "max_edits": 1,
+        "confusions": {"O": "0", "I": "1", "S": "5", "B": "8"},
+        "default": None,
+        "products": {},
+    },
+    # What label text can look like (see product_format.py): per product-code specs, or a
+    # "default" that replaces the built-in upper-case/digit allowlist ({} for no limits)
+    "formats": {
+        "default": None,
+        "products": {},
+    },
+    # Shared OCR server (see ocr_server.py): "mode" "client" sends frames to it, "local"
+    # loads a model in this app; a server that does not answer falls back to local.
+    # "authkey" is the server's shared secret, unless OCR_SERVER_AUTHKEY is set
+    "ocr_server": {
+        "mode": "local",
+        "address": "127.0.0.1:8765",
+        "authkey": None,
+    },
+    # CPU split between capture, vision and OCR (see resource_governor.py): a profile name
+    # from PROFILES or from "profiles", e.g. {"ocr": {"cores": "rest", "cv2_threads": 1}}
+    "resources": {
+        "profile": "recommended",
+        "profiles": {},
+    },
+    # Frame quality limits overriding frame_quality.DEFAULT_THRESHOLDS, e.g. {"min_sharpness": 40}
+    "quality": {},
+}
+
+
+# Station Config Class
+class StationConfig:
+    """Per-station settings kept in a JSON file; missing keys fall back to DEFAULT_CONFIG."""
+
+    def __init__(self, path="station_config.json"):
+        self.path = path
+        self.data = copy.deepcopy(DEFAULT_CONFIG)
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Could not read {self.path}, using defaults: {e}")
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def roi(self, camera_id):
+        """OCR region for camera_id (0-based) in frame pixels, or None for the full frame."""
+        return self.data["rois"].get(f"camera_{camera_id + 1}")
+
+    def set_roi(self, camera_id, roi):
+        key = f"camera_{camera_id + 1}"
+        if roi is None:
+            self.data["rois"].pop(key, None)
+        else:
+            # Keep a hand-edited upscale factor when the box is redrawn
+            previous = self.data["rois"].get(key) or {}
+            self.data["rois"][key] = dict(roi, scale=roi.get("scale", previous.get("scale", 1.0)))
+        self.save()
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import pytest
+
+from archive import InspectionArchiver
+from database import DatabaseManager
+
+
+@pytest.fixture
+def archiver(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "machine_vision.db"))
+    archiver = InspectionArchiver(manager, str(tmp_path / "archive"), max_age_days=30, use_parquet=False)
+    for day, hour in ((1, 9), (2, 9), (3, 9)):
+        manager.writer.submit(manager._insert_inspection, "AB123456", datetime(2024, 1, day, hour),
+                              [(1, "INNER", None, None)], "PASS", "", []).result(timeout=10)
+    yield archiver
+    manager.close()
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2024-01-02", "2024-01-03"),
+    ("2024-01-02T00:00", "2024-01-03T00:00"),
+    (datetime(2024, 1, 2), datetime(2024, 1, 3)),
+])
+@pytest.mark.parametrize("archived", [False, True])
+def test_query_history_bounds(archiver, start, end, archived):
+    if archived:
+        assert archiver.archive_old_inspections(now=datetime(2024, 6, 1)) == 3
+    rows = list(archiver.query_history(start=start, end=end))
+    assert [str(row["timestamp"])[:19] for row in rows] == ["2024-01-02 09:00:00"]
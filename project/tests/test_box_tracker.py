@@ -0,0 +1,31 @@
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+from box_tracker import follow, make_track  # noqa: E402
+
+
+def label_frame(shift=0):
+    frame = np.full((120, 200), 90, dtype=np.uint8)
+    cv2.rectangle(frame, (0, 40), (199, 80), 235, -1)
+    cv2.putText(frame, "AB12345", (4 + shift, 72), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 20, 2)
+    return frame
+
+
+def test_box_inside_the_frame_is_followed():
+    track = follow(make_track(label_frame(), [[20, 150, 40, 80]]), label_frame(shift=5))
+    assert track["boxes"] == [[25, 155, 40, 80]]
+
+
+@pytest.mark.parametrize("box", [[-3, 150, 40, 80], [-3, 203, 40, 80], [10, 190, -5, 125]])
+def test_box_past_the_frame_edge_stays_put_on_the_same_frame(box):
+    gray = label_frame()
+    track = make_track(gray, [box])
+    assert track is not None
+    assert follow(track, gray)["boxes"] == [box]
+
+
+def test_box_past_the_frame_edge_moves_with_the_label():
+    track = follow(make_track(label_frame(), [[-3, 150, 40, 80]]), label_frame(shift=4))
+    assert track["boxes"] == [[1, 154, 40, 80]]
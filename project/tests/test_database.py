@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+from database import DatabaseManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "machine_vision.db"))
+    yield manager
+    manager.close()
+
+
+def insert_at(manager, timestamp, product_code="AB123456", validation="PASS"):
+    """Store one inspection as if it had been made at timestamp; returns its id."""
+    readings = [(1, "INNER", None, None)]
+    return manager.writer.submit(manager._insert_inspection, product_code, timestamp, readings,
+                                 validation, "", []).result(timeout=10)
+
+
+def test_managers_sharing_a_database_get_distinct_ids(tmp_path):
+    db_name = str(tmp_path / "machine_vision.db")
+    first, second = DatabaseManager(db_name), DatabaseManager(db_name)
+    try:
+        futures = []
+        for manager in (first, second, first, second):
+            readings = [{"camera_index": 1, "text": "INNER"}]
+            futures.append(manager.insert_inspection("AB123456", readings, "PASS", images=[(1, b"jpeg")]))
+        ids = [future.result(timeout=10) for future in futures]
+        assert len(set(ids)) == 4
+
+        first.flush(timeout=10)
+        second.flush(timeout=10)
+        for product_id in ids:
+            assert first.get_readings(product_id) == [
+                {"camera_index": 1, "text": "INNER", "confidence": None, "latency_ms": None}]
+        rows = first.reader().execute("SELECT product_id FROM images ORDER BY product_id").fetchall()
+        assert [row[0] for row in rows] == sorted(ids)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_failed_writer_job_is_logged(manager, capsys):
+    def broken(cursor):
+        cursor.execute("INSERT INTO no_such_table VALUES (1)")
+
+    assert manager.writer.submit(broken).exception(timeout=10) is not None
+    assert "Database job broken failed" in capsys.readouterr().out
+
+
+def test_incremental_vacuum_runs_on_the_writer(manager):
+    assert manager.incremental_vacuum().result(timeout=10) == []
+
+
+@pytest.mark.parametrize("end", [
+    "2024-05-01T10:00",
+    "2024-05-01T10:00:00",
+    "2024-05-01 10:00:00",
+    datetime(2024, 5, 1, 10),
+    datetime(2024, 5, 1, 9, 30),
+    "2024-05-01T09:30:15",
+])
+def test_production_stats_end_bound(manager, end):
+    for hour in (8, 9, 10, 11):
+        insert_at(manager, datetime(2024, 5, 1, hour, 20))
+    manager.flush(timeout=10)
+
+    stats = manager.get_production_stats(start="2024-05-01T08:45", end=end)
+    assert [entry["hour"] for entry in stats] == ["2024-05-01 08:00", "2024-05-01 09:00"]
+
+
+@pytest.mark.parametrize("start, end, hours", [
+    ("2024-05-01T09:00", "2024-05-01T11:00", [9, 10]),
+    ("2024-05-01 09:00:00", "2024-05-01T10:20:00", [9]),
+    (datetime(2024, 5, 1, 9), datetime(2024, 5, 1, 10, 20, 1), [9, 10]),
+])
+def test_products_page_time_bounds(manager, start, end, hours):
+    ids = {hour: insert_at(manager, datetime(2024, 5, 1, hour, 20)) for hour in (8, 9, 10, 11)}
+    manager.flush(timeout=10)
+
+    rows, next_after_id = manager.get_products_page(start=start, end=end, ascending=True)
+    assert [row["id"] for row in rows] == [ids[hour] for hour in hours]
+    assert next_after_id is None
@@ -0,0 +1,19 @@
+import pytest
+
+from database import DatabaseManager
+from excel_export import ExcelExporter
+
+pytest.importorskip("openpyxl")
+
+
+def test_export_includes_inspections_still_queued(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "machine_vision.db"))
+    exporter = ExcelExporter(manager, str(tmp_path))
+    try:
+        manager.insert_product("AB123456", "INNER", "AB123456", "", "PASS", "")
+        # No flush here: the export itself has to wait for the writer
+        _, count = exporter.export_async().result(timeout=30)
+        assert count == 1
+    finally:
+        exporter.close()
+        manager.close()
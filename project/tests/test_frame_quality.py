@@ -0,0 +1,33 @@
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+from frame_quality import BLUR, EMPTY, OK, FrameQuality  # noqa: E402
+
+
+def label_frame():
+    frame = np.full((480, 640, 3), 110, dtype=np.uint8)
+    cv2.rectangle(frame, (120, 160), (520, 320), (235, 235, 235), -1)
+    cv2.putText(frame, "INNER", (150, 220), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (20, 20, 20), 3)
+    cv2.putText(frame, "AB123456", (150, 290), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (20, 20, 20), 3)
+    return frame
+
+
+def test_sharp_label_is_ok():
+    assert FrameQuality().assess(label_frame())["reason"] == OK
+
+
+def test_blurred_label_is_blur_not_empty():
+    blurred = cv2.GaussianBlur(label_frame(), (31, 31), 0)
+    assert FrameQuality().assess(blurred)["reason"] == BLUR
+
+
+def test_flat_scene_is_empty():
+    assert FrameQuality().assess(np.full((480, 640, 3), 110, dtype=np.uint8))["reason"] == EMPTY
+
+
+def test_best_prefers_the_sharp_frame():
+    sharp = label_frame()
+    frame, quality = FrameQuality().best([cv2.GaussianBlur(sharp, (31, 31), 0), sharp])
+    assert frame is sharp and quality["ok"]
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("cv2")
+
+import ocr_server  # noqa: E402
+from station_config import StationConfig  # noqa: E402
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.delenv(ocr_server.AUTHKEY_ENV, raising=False)
+    config = StationConfig(str(tmp_path / "station_config.json"))
+    config.data["ocr_server"] = {"mode": "client"}
+    return config
+
+
+def test_no_default_authkey(config):
+    assert ocr_server.server_settings(config) == ("client", "127.0.0.1:8765", None)
+
+
+def test_authkey_from_environment_wins(config, monkeypatch):
+    config.data["ocr_server"]["authkey"] = "from-config"
+    assert ocr_server.server_settings(config)[2] == "from-config"
+    monkeypatch.setenv(ocr_server.AUTHKEY_ENV, "from-env")
+    assert ocr_server.server_settings(config)[2] == "from-env"
+
+
+def test_server_refuses_to_start_without_authkey():
+    with pytest.raises(ValueError, match="authkey"):
+        ocr_server.OCRServer("127.0.0.1:0", backend="stub")
+
+
+def test_client_mode_without_authkey_falls_back_to_local(config):
+    assert ocr_server.connect(config) is None
+
+
+def test_default_address_is_loopback():
+    assert ocr_server.parse_address(ocr_server.DEFAULT_ADDRESS) == ("127.0.0.1", 8765)
+    assert ocr_server.parse_address(":9000") == ("127.0.0.1", 9000)
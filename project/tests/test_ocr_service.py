@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("numpy")
+
+from ocr_service import OCRService  # noqa: E402
+
+
+@pytest.fixture
+def service():
+    # The stub's delay makes every worker's warm-up slow, so they come up at different times
+    service = OCRService(workers=3, backend="stub", backend_options={"delay": 0.3})
+    yield service
+    service.close()
+
+
+def test_warm_up_reaches_every_worker(service):
+    pids = {future.result(timeout=60)[0] for future in service.warm_up()}
+    assert len(pids) == 3
+
+
+def test_when_ready_waits_for_every_worker(service):
+    answered = threading.Event()
+    result = {}
+    service.when_ready(lambda worker_ms: result.update(ready=worker_ms) or answered.set(),
+                       lambda error: result.update(error=error) or answered.set())
+    assert answered.wait(60)
+    assert len(result["ready"]) == 3
+
+
+def test_when_ready_reports_workers_that_fail_to_start():
+    service = OCRService(workers=2, backend="no-such-backend")
+    answered = threading.Event()
+    result = {}
+    try:
+        service.when_ready(lambda worker_ms: result.update(ready=worker_ms) or answered.set(),
+                           lambda error: result.update(error=error) or answered.set())
+        assert answered.wait(60)
+        assert "error" in result and "ready" not in result
+    finally:
+        service.close()
@@ -0,0 +1,63 @@
+import pytest
+
+from validation import ValidationEngine
+
+ANY_RULE = {"mode": "any", "cameras": {"*": {"all": ["INNER", "{code}"]}}}
+ALL_RULE = {"mode": "all", "cameras": {"camera_1": {"any": ["INNER"]}, "camera_2": {"any": ["{code}"]}}}
+
+
+def test_any_rule_is_decided_by_the_first_passing_camera():
+    engine = ValidationEngine(ANY_RULE)
+    assert engine.decides("AB123456", 0, "INNER AB123456")
+    assert not engine.decides("AB123456", 1, "OUTER")
+    assert not engine.decides("AB123456", 2, "No Feed")
+
+
+def test_all_rule_is_decided_by_the_first_failing_camera():
+    engine = ValidationEngine(ALL_RULE)
+    assert not engine.decides("AB123456", 0, "INNER")
+    assert engine.decides("AB123456", 0, "OUTER")
+    assert engine.decides("AB123456", 1, "No Feed")
+    # camera_3 is not part of the rule, so its text cannot fail the part
+    assert not engine.decides("AB123456", 2, "OUTER")
+
+
+@pytest.mark.parametrize("texts, result", [
+    ({0: "INNER", 1: "AB123456"}, "PASS"),
+    ({0: "INNER", 1: "AB123457X"}, "FAIL"),
+    ({0: "INNER", 1: "ZZ999999"}, "FAIL"),
+    ({0: "INNER"}, "FAIL"),
+])
+def test_all_rule_needs_every_named_camera(texts, result):
+    assert ValidationEngine(ALL_RULE).validate("AB123456", texts)[0] == result
+
+
+@pytest.mark.parametrize("product_code, text", [
+    ("AB123456", "AB123457"),
+    ("AB123456", "AB123459"),
+    ("AB123456", "XB123456"),
+    ("AB-1234", "INNER AB-1235"),
+])
+def test_code_one_edit_away_is_another_product(product_code, text):
+    rule = {"mode": "any", "cameras": {"*": {"all": ["{code}"]}}}
+    assert ValidationEngine(rule).validate(product_code, {0: text})[0] == "FAIL"
+
+
+def test_code_still_matches_through_confusions():
+    rule = {"mode": "any", "cameras": {"*": {"all": ["{code}"]}}}
+    assert ValidationEngine(rule).validate("AB123456", {0: "LOT A8I23456"})[0] == "PASS"
+
+
+def test_literal_tokens_allow_a_misread():
+    rule = {"mode": "any", "cameras": {"*": {"any": ["OUTER"]}}}
+    assert ValidationEngine(rule).validate("AB123456", {0: "0UTEP"})[0] == "PASS"
+
+
+@pytest.mark.parametrize("product_code", ["", "   "])
+def test_code_requirement_without_a_code_fails(product_code):
+    engine = ValidationEngine({"mode": "any", "cameras": {"*": {"all": ["{code}"]}}})
+    assert engine.validate(product_code, {0: "anything"})[0] == "FAIL"
+    assert not engine.decides(product_code, 0, "anything")
+    # The code is only one of the acceptable tokens here, so INNER still passes
+    engine = ValidationEngine(ANY_RULE | {"cameras": {"*": {"any": ["INNER", "{code}"]}}})
+    assert engine.validate(product_code, {0: "INNER"})[0] == "PASS"
@@ -0,0 +1,226 @@
+import bisect
+from collections import deque
+
+# Letters OCR often reads in place of a digit (and vice versa); both sides are folded to the digit
+DEFAULT_CONFUSIONS = {"O": "0", "I": "1", "S": "5", "B": "8"}
+
+# Tokens shorter than this must match exactly (after folding); a single edit is too loose for them
+MIN_FUZZY_LENGTH = 5
+
+# Placeholder texts the apps show instead of OCR output; they never satisfy a rule
+NO_TEXT = {"", "NO FEED", "SKIPPED", "NO TEXT DETECTED", "NO OCR AVAILABLE", "INVALID FRAME"}
+
+SEPARATOR = "\n"
+
+# Token index standing for a "{code}" token when there is no product code; it is never found
+UNSATISFIABLE = -1
+
+
+def is_blank(text):
+    text = (text or "").strip().upper()
+    return text in NO_TEXT or text.startswith(("OCR ERROR", "POOR IMAGE"))
+
+
+def within_edits(pattern, text, max_edits):
+    """True if pattern occurs in text with at most max_edits insertions, deletions or substitutions."""
+    previous = [0] * (len(text) + 1)  # a match may start anywhere in text
+    for i, pattern_char in enumerate(pattern, 1):
+        current = [i] + [0] * len(text)
+        for j, text_char in enumerate(text, 1):
+            current[j] = min(previous[j - 1] + (pattern_char != text_char), previous[j] + 1, current[j - 1] + 1)
+        if min(current) > max_edits:
+            return False
+        previous = current
+    return min(previous) <= max_edits
+
+
+class Automaton:
+    """Aho-Corasick automaton: finds every occurrence of every pattern in one pass over the text."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                if char not in self.goto[node]:
+                    self.goto[node][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = self.goto[node][char]
+            self.output[node].append(index)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                fallback = self.goto[state].get(char, 0)
+                self.fail[child] = fallback if fallback != child else 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def search(self, text):
+        """Yield (end position, pattern index) for every match."""
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for index in self.output[node]:
+                yield position, index
+
+
+# Compiled Rule Class
+class CompiledRule:
+    """A validation rule bound to one product code, with all of its tokens in one automaton.
+
+    Rule format (as stored in the station config):
+        {"mode": "any" | "all",
+         "cameras": {"camera_1": {"all": ["INNER", "{code}"]}, "*": {"any": [...]}},
+         "max_edits": 1}
+    "{code}" stands for the product code and "*" for every camera without its own entry.
+    With mode "any" one passing camera passes the part; with "all" every camera must pass.
+    A camera with an empty token list passes whenever it has any text.
+
+    max_edits applies to literal tokens only. Tokens built from "{code}" must match exactly
+    after confusion folding, since a code one edit away is a different product; with no
+    product code they cannot match at all.
+    """
+
+    def __init__(self, rule, product_code, confusions=None, max_edits=1):
+        self.mode = rule.get("mode", "any")
+        self.max_edits = rule.get("max_edits", max_edits)
+        self.table = str.maketrans(confusions if confusions is not None else DEFAULT_CONFUSIONS)
+        self.requirements = {}
+        tokens = []
+        exact = set()
+        for camera, requirement in rule.get("cameras", {}).items():
+            combine = "all" if "all" in requirement else "any"
+            camera_tokens = []
+            for token in requirement.get(combine, []):
+                from_code = "{code}" in token
+                if from_code and not product_code.strip():
+                    camera_tokens.append(UNSATISFIABLE)
+                    continue
+                token = self.normalize(token.replace("{code}", product_code))
+                if not token:
+                    continue
+                if token not in tokens:
+                    tokens.append(token)
+                if from_code:
+                    exact.add(tokens.index(token))
+                camera_tokens.append(tokens.index(token))
+            self.requirements[camera] = (combine, camera_tokens)
+        self.tokens = tokens
+        self.exact = exact
+        self.automaton = Automaton(tokens)
+
+    def normalize(self, text):
+        return (text or "").upper().translate(self.table)
+
+    def requirement(self, camera_index):
+        return self.requirements.get(f"camera_{camera_index + 1}", self.requirements.get("*"))
+
+    def found_tokens(self, texts):
+        """{camera_index: set of token indexes} for {camera_index: text}, scanning all cameras at once."""
+        cameras = [camera for camera, text in texts.items() if not is_blank(text)]
+        normalized = [self.normalize(texts[camera]) for camera in cameras]
+        combined = SEPARATOR.join(normalized)
+        starts, position = [], 0
+        for text in normalized:
+            starts.append(position)
+            position += len(text) + len(SEPARATOR)
+
+        found = {camera: set() for camera in texts}
+        for end, index in self.automaton.search(combined):
+            found[cameras[bisect.bisect_right(starts, end) - 1]].add(index)
+
+        # Anything still missing may be there with a misread character or two
+        if self.max_edits:
+            for camera, text in zip(cameras, normalized):
+                for index, token in enumerate(self.tokens):
+                    if (index not in found[camera] and index not in self.exact and len(token) >= MIN_FUZZY_LENGTH
+                            and within_edits(token, text, self.max_edits)):
+                        found[camera].add(index)
+        return found
+
+    def evaluate(self, texts):
+        """Returns ("PASS" | "FAIL", {camera_index: passed}) for {camera_index: text}."""
+        found = self.found_tokens(texts)
+        passed = {}
+        for camera, text in texts.items():
+            requirement = self.requirement(camera)
+            if requirement is None:
+                continue
+            combine, token_indexes = requirement
+            if is_blank(text):
+                passed[camera] = False
+            elif not token_indexes:
+                passed[camera] = True
+            elif combine == "all":
+                passed[camera] = all(index in found[camera] for index in token_indexes)
+            else:
+                passed[camera] = any(index in found[camera] for index in token_indexes)
+
+        if self.mode == "all":
+            required = [key for key in self.requirements if key != "*"]
+            # Every named camera has to be present, and every camera checked has to pass
+            missing = any(int(key.split("_")[1]) - 1 not in passed for key in required)
+            ok = bool(passed) and not missing and all(passed.values())
+        else:
+            ok = any(passed.values())
+        return ("PASS" if ok else "FAIL"), passed
+
+    def decides(self, camera_index, text):
+        """Whether one camera's text settles the part on its own, before the other cameras are read.
+
+        Under mode "any" a passing camera passes the part; under "all" a failing one fails it.
+        Cameras the rule does not cover never decide.
+        """
+        passed = self.evaluate({camera_index: text})[1]
+        if camera_index not in passed:
+            return False
+        return not passed[camera_index] if self.mode == "all" else passed[camera_index]
+
+
+# Validation Engine Class
+class ValidationEngine:
+    """Looks up the rule for a product code in the station config and caches it compiled.
+
+    Config keys under "validation": "products" maps product codes to rules, "default"
+    replaces the application's built-in rule, and "confusions" / "max_edits" tune matching.
+    """
+
+    def __init__(self, default_rule, config=None):
+        self.default_rule = default_rule
+        self.config = config
+        self.cache = {}
+
+    def settings(self):
+        return (self.config.data.get("validation") or {}) if self.config else {}
+
+    def rule_for(self, product_code):
+        product_code = (product_code or "").strip()
+        compiled = self.cache.get(product_code)
+        if compiled is None:
+            settings = self.settings()
+            rule = (settings.get("products") or {}).get(product_code) or settings.get("default") or self.default_rule
+            compiled = CompiledRule(rule, product_code, settings.get("confusions"), settings.get("max_edits", 1))
+            self.cache[product_code] = compiled
+        return compiled
+
+    def validate(self, product_code, texts):
+        """Returns ("PASS" | "FAIL", {camera_index: passed}) for {camera_index: text}."""
+        return self.rule_for(product_code).evaluate(texts)
+
+    def decides(self, product_code, camera_index, text):
+        """Whether one camera's text already settles the part (see CompiledRule.decides)."""
+        return self.rule_for(product_code).decides(camera_index, text)
+
+    def clear_cache(self):
+        self.cache.clear()
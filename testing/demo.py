@@ -1,11 +1,12 @@
 import sys
 import cv2
 import numpy as np
-import easyocr
 import pandas as pd
 from datetime import datetime
 import time
 import os
+import queue
+import threading
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QTextEdit, QVBoxLayout,
     QHBoxLayout, QGridLayout, QFrame, QMainWindow, QAction, QFileDialog,
@@ -14,8 +15,18 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QFont, QPixmap, QPalette, QColor, QImage
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QThread
 
+# The OCR backends, the shared OCR server client and the station config live in project/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "project"))
+from ocr_server import RemoteBackend, backend_for
+from ocr_service import warm_up_backend
+from station_config import StationConfig
+
 # ============ Global Settings ============
 CAPTURE_INTERVAL = 5  # seconds between OCR captures
+FLUSH_BATCH_SIZE = 20  # rows buffered before the Excel file is rewritten
+FLUSH_INTERVAL = 10  # max seconds a captured row waits before being saved
+# OCR engine from ocr_backends.BACKENDS ("easyocr", "tesseract" or "stub" for dry runs)
+OCR_BACKEND = "easyocr"
 today_str = datetime.now().strftime("%d-%m-%Y")
 excel_file = f"product_info_{today_str}.xlsx"
 
@@ -33,8 +44,111 @@ else:
     df.to_excel(excel_file, index=False)
     PRODUCT_COUNT = 1
 
-# OCR Reader
-ocr_reader = easyocr.Reader(['en'], gpu=False)
+# OCR backend, built on a background thread so the window and cameras come up straight away
+ocr_backend = None
+ocr_ready = threading.Event()
+
+
+def load_ocr_backend(on_ready=None):
+    global ocr_backend
+    started = time.perf_counter()
+    try:
+        # The shared OCR server when station_config.json selects client mode and it answers;
+        # its model is already warm
+        backend = backend_for(StationConfig(), OCR_BACKEND)
+        if not isinstance(backend, RemoteBackend):
+            warm_up_backend(backend)
+    except Exception as e:
+        print(f"❌ OCR model failed to load: {e}")
+        return
+    ocr_backend = backend
+    ocr_ready.set()
+    print(f"OCR model ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+    if on_ready:
+        on_ready()
+
+
+# ============ Excel Persistence Worker ============
+class ExcelWriterThread(threading.Thread):
+    """Single owner of df and the Excel file.
+
+    Camera threads only call submit(), which numbers the product under a lock and queues the
+    row. This thread batches rows into df and rewrites the workbook when FLUSH_BATCH_SIZE rows
+    are pending or FLUSH_INTERVAL seconds have passed, so capture never waits on disk I/O.
+    """
+
+    def __init__(self, excel_file, next_product, batch_size=FLUSH_BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        super().__init__(name="ExcelWriter", daemon=True)
+        self.excel_file = excel_file
+        self.next_product = next_product
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows = queue.Queue()
+        self.count_lock = threading.Lock()
+        self.df_lock = threading.Lock()
+        self.running = True
+
+    def submit(self, camera, info):
+        """Queue a capture row; returns the product number assigned to it."""
+        with self.count_lock:
+            product_no = self.next_product
+            self.next_product += 1
+        self.rows.put({"no of product": product_no, "time": datetime.now().strftime("%H:%M:%S"),
+                       "camera": camera, "info": info})
+        return product_no
+
+    def run(self):
+        pending = []
+        last_flush = time.time()
+        while self.running or not self.rows.empty():
+            timeout = max(0.0, self.flush_interval - (time.time() - last_flush))
+            try:
+                row = self.rows.get(timeout=timeout)
+                # Drain whatever else is already waiting without blocking
+                while True:
+                    if row is not None:
+                        pending.append(row)
+                    if len(pending) >= self.batch_size:
+                        break
+                    row = self.rows.get_nowait()
+            except queue.Empty:
+                pass
+
+            if pending and (len(pending) >= self.batch_size or time.time() - last_flush >= self.flush_interval
+                            or not self.running):
+                self.flush(pending)
+                pending = []
+            if not pending:
+                last_flush = time.time()
+
+        if pending:
+            self.flush(pending)
+
+    def flush(self, pending):
+        global df
+        try:
+            with self.df_lock:
+                df = pd.concat([df, pd.DataFrame(pending)], ignore_index=True)
+                snapshot = df
+            # Save to a temp file first so a crash mid-write never corrupts the workbook
+            tmp_path = self.excel_file + ".tmp.xlsx"
+            snapshot.to_excel(tmp_path, index=False)
+            os.replace(tmp_path, self.excel_file)
+        except Exception as e:
+            print(f"❌ Failed to save {len(pending)} rows to {self.excel_file}: {e}")
+
+    def snapshot(self):
+        with self.df_lock:
+            return df.copy()
+
+    def stop(self):
+        self.running = False
+        self.rows.put(None)  # wake the writer so it flushes and exits straight away
+        self.join()
+
+
+excel_writer = ExcelWriterThread(excel_file, PRODUCT_COUNT)
+excel_writer.start()
 
 
 # ============ Camera Worker Thread ============
@@ -48,7 +162,6 @@ class CameraThread(QThread):
         self.last_capture_time = 0
 
     def run(self):
-        global PRODUCT_COUNT, df
         cap = cv2.VideoCapture(self.cam_index)
         if not cap.isOpened():
             print(f"❌ Camera {self.cam_index} cannot be opened")
@@ -60,26 +173,20 @@ class CameraThread(QThread):
                 break
 
             current_time = time.time()
-            if current_time - self.last_capture_time >= CAPTURE_INTERVAL:
+            # Frames are shown while the OCR model loads; captures start once it is ready
+            if ocr_ready.is_set() and current_time - self.last_capture_time >= CAPTURE_INTERVAL:
                 self.last_capture_time = current_time
 
-                # Run OCR
-                results = ocr_reader.readtext(frame)
-                if results:
-                    text_detected = " | ".join([text for (_, text, conf) in results])
-                else:
-                    text_detected = ""
+                # Run OCR (backends take RGB)
+                results = ocr_backend.readtext(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                text_detected = " | ".join(text for text, _ in results)
 
                 now_time = datetime.now().strftime("%H:%M:%S")
 
-                # Append row to Excel
-                new_row = {"no of product": PRODUCT_COUNT, "time": now_time,
-                           "camera": f"Camera {self.cam_index+1}", "info": text_detected}
-                df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                df.to_excel(excel_file, index=False)
+                # Hand the row to the writer thread; saving happens off the capture loop
+                product_no = excel_writer.submit(f"Camera {self.cam_index+1}", text_detected)
 
-                print(f"[{now_time}] Cam {self.cam_index+1} Capture #{PRODUCT_COUNT} → {text_detected}")
-                PRODUCT_COUNT += 1
+                print(f"[{now_time}] Cam {self.cam_index+1} Capture #{product_no} → {text_detected}")
 
                 # Emit signal to GUI
                 self.frameCaptured.emit(self.cam_index, frame, text_detected)
@@ -109,6 +216,8 @@ class SettingsDialog(QDialog):
 
 # ============ Main GUI ============
 class MachineVisionGUI(QMainWindow):
+    ocrReady = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.is_fullscreen = False
@@ -119,6 +228,8 @@ class MachineVisionGUI(QMainWindow):
         self.setup_statusbar()
         self.apply_dark_styles()
         self.setup_camera_threads()
+        self.ocrReady.connect(self.on_ocr_ready)
+        threading.Thread(target=load_ocr_backend, args=(self.ocrReady.emit,), name="OCRLoader", daemon=True).start()
 
     def init_ui(self):
         self.setWindowTitle("Machine Vision System")
@@ -197,7 +308,7 @@ class MachineVisionGUI(QMainWindow):
     def export_data(self):
         file_path, _ = QFileDialog.getSaveFileName(self, "Export Report", "", "Excel Files (*.xlsx)")
         if file_path:
-            df.to_excel(file_path, index=False)
+            excel_writer.snapshot().to_excel(file_path, index=False)
             QMessageBox.information(self, "Export", f"Data exported to {file_path}")
 
     def setup_menu(self):
@@ -208,6 +319,9 @@ class MachineVisionGUI(QMainWindow):
         file_menu.addAction(exit_action)
 
     def setup_statusbar(self):
+        self.statusBar().showMessage('OCR model loading...')
+
+    def on_ocr_ready(self):
         self.statusBar().showMessage('Ready - System Initialized')
 
     def apply_dark_styles(self):
@@ -216,6 +330,10 @@ class MachineVisionGUI(QMainWindow):
     def closeEvent(self, event):
         for thread in self.camera_threads:
             thread.stop()
+        # Flush any rows still buffered before exiting
+        excel_writer.stop()
+        if isinstance(ocr_backend, RemoteBackend):
+            ocr_backend.client.close()
         event.accept()
 
 